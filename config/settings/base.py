@@ -4,6 +4,7 @@ Base settings to build other settings files upon.
 import os
 
 import environ
+from corsheaders.defaults import default_headers
 
 ROOT_DIR = (
     environ.Path(__file__) - 3
@@ -183,6 +184,7 @@ AUTH_PASSWORD_VALIDATORS = [
 # ------------------------------------------------------------------------------
 # https://docs.djangoproject.com/en/dev/ref/settings/#middleware
 MIDDLEWARE = [
+    "mastermind_py.mastermind.instrumentation.InstrumentationMiddleware",
     'corsheaders.middleware.CorsMiddleware',
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -266,7 +268,7 @@ ACCOUNT_EMAIL_VERIFICATION = "mandatory"
 # ------------------------------------------------------------------------------
 REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'mastermind_py.mastermind.renderers.CompactJSONRenderer',
     ],
     'DEFAULT_PARSER_CLASSES': [
         'rest_framework.parsers.JSONParser',
@@ -277,4 +279,27 @@ REST_FRAMEWORK = {
 ####################################################
 
 CORS_ORIGIN_ALLOW_ALL = True
-CORS_EXPOSE_HEADERS = ['Location']
+CORS_EXPOSE_HEADERS = ['Location', 'ETag']
+# Conditional requests of the pollers of a game
+CORS_ALLOW_HEADERS = list(default_headers) + ['if-none-match']
+
+####################################################
+# MASTERMIND                                       #
+####################################################
+
+# Precomputed feedback tables, see the build_feedback_tables management command
+FEEDBACK_TABLES_DIR = env("FEEDBACK_TABLES_DIR", default=str(APPS_DIR("feedback_tables")))
+FEEDBACK_TABLE_CONFIGS = ["4x6", "4x8", "5x6"]
+
+# Keep running games in HOT_GAMES_CACHE and write them to the database when they
+# finish, see HotGames and the flush_hot_games management command
+HOT_GAMES = env.bool("HOT_GAMES", default=False)
+HOT_GAMES_CACHE = "default"
+# Seconds without guesses after which flush_hot_games writes a running game
+HOT_GAMES_IDLE_TIMEOUT = env.int("HOT_GAMES_IDLE_TIMEOUT", default=60 * 30)
+
+# Redis cache where the workers add up the measures of /metrics, or None to report
+# the measures of each process, see instrumentation.Registry
+METRICS_CACHE = None
+# Seconds between the flushes of the measures of a worker to METRICS_CACHE
+METRICS_FLUSH_INTERVAL = env.int("METRICS_FLUSH_INTERVAL", default=10)
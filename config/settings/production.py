@@ -26,8 +26,19 @@ CACHES = {
             # http://niwinz.github.io/django-redis/latest/#_memcached_exceptions_behavior
             "IGNORE_EXCEPTIONS": True,
         },
-    }
+    },
+    # The hot games are not a cache but the only copy of the recent guesses, errors
+    # must fail the requests instead of losing them
+    "hot": {
+        "BACKEND": "django_redis.cache.RedisCache",
+        "LOCATION": env("HOT_GAMES_REDIS_URL", default=env("REDIS_URL")),
+        "OPTIONS": {
+            "CLIENT_CLASS": "django_redis.client.DefaultClient",
+        },
+    },
 }
+HOT_GAMES_CACHE = "hot"
+METRICS_CACHE = "default"
 
 # SECURITY
 # ------------------------------------------------------------------------------
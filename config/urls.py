@@ -4,11 +4,15 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.views import defaults as default_views
 
+from mastermind_py.mastermind.views import metrics
+
 urlpatterns = [
     # Django Admin, use {% url 'admin:index' %}
     path(settings.ADMIN_URL, admin.site.urls),
     # User management
     path("api/games/", include("mastermind_py.mastermind.urls", namespace="mastermind")),
+    # Prometheus metrics, see instrumentation.Registry
+    path("metrics", metrics, name="metrics"),
     # Your stuff: custom urls includes go here
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
 
@@ -0,0 +1,58 @@
+import os
+import timeit
+from typing import Any, Callable, Dict, List, Tuple
+
+import django
+
+# Modules of this package run by the benchmark management command, each one has a
+# run function that returns a dict of named measures
+BENCHMARKS = ['feedback', 'score_matrix', 'solver', 'domain', 'serialization', 'repo', 'api']
+
+# Results of every benchmark by name, as saved by the benchmark command
+Results = Dict[str, Dict[str, float]]
+
+
+def setup() -> None:
+    """Configures Django for benchmarks run as scripts, with the same defaults as manage.py"""
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings.local")
+    django.setup()
+
+
+def best_of(function: Callable[[], Any], number: int, repeat: int = 5) -> float:
+    """
+    Returns the best time, in seconds, of a single call to function. The minimum of
+    several repetitions is the least noisy estimate of what the code can do
+    """
+    return min(timeit.repeat(function, number=number, repeat=repeat)) / number
+
+
+def higher_is_better(measure: str) -> bool:
+    """Throughputs end in _per_s, every other measure is a time, a size or a count"""
+    return measure.endswith('_per_s')
+
+
+def is_legacy(measure: str) -> bool:
+    """
+    Measures of the legacy implementations start with legacy_, they are the reference
+    the current code is measured against, not code that can regress
+    """
+    return measure.startswith('legacy_')
+
+
+def compare(baseline: Results, results: Results) -> List[Tuple[str, str, float, float, float]]:
+    """
+    Returns (benchmark, measure, baseline, result, change) for every measure of both
+    results, where change is the relative change, positive when the result is worse
+    than the baseline. Measures missing from either side and the legacy ones are skipped
+    """
+    changes = []
+    for name, measures in results.items():
+        for measure, value in measures.items():
+            previous = baseline.get(name, {}).get(measure)
+            if not previous or is_legacy(measure):
+                continue
+            change = (value - previous) / previous
+            if higher_is_better(measure):
+                change = -change
+            changes.append((name, measure, previous, value, change))
+    return changes
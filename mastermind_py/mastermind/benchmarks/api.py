@@ -0,0 +1,87 @@
+"""
+Latency of full request round trips through the Django test client, for every
+route of urls.py: middleware, view, repositories, database and rendering. Needs a
+database, run it with
+
+    python manage.py benchmark api
+"""
+import statistics
+import time
+from typing import Any, Callable, Dict, List
+
+from django.core.cache import cache
+from django.test.utils import setup_test_environment, teardown_test_environment
+from rest_framework.test import APIClient
+
+from mastermind_py.mastermind.domain import Game, colors
+from mastermind_py.mastermind.repo import Games
+
+BASE_URL = '/api/games/'
+# A code that never wins against the secret codes of new_games, which only use the
+# first 6 colors
+MISS = [colors[6]] * 4
+
+
+def measure(request: Callable[[int], Any], requests: int) -> float:
+    """
+    Sends requests requests, request receives the number of the request, and returns
+    the median latency in milliseconds. Requests that do not succeed are errors of
+    the benchmark, not slow requests
+    """
+    latencies = []
+    for number in range(requests):
+        start = time.perf_counter()
+        response = request(number)
+        latencies.append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            raise Exception("Request %d failed with %d: %s" % (number, response.status_code, response.content))
+    return statistics.median(latencies) * 1e3
+
+
+def new_games(count: int, max_guesses: int = 100) -> List[int]:
+    """Stores count new 4 slots, 6 colors games and returns their ids"""
+    return [game.id for game in Games().save_all(Game.new_batch(count, 4, 6, max_guesses))]
+
+
+def run(requests: int = 200) -> Dict[str, float]:
+    """Returns the median milliseconds of a round trip of every route, see round_trips"""
+    # Allows the host of the test client, like the test runner does
+    setup_test_environment()
+    try:
+        return round_trips(APIClient(), requests)
+    finally:
+        teardown_test_environment()
+
+
+def round_trips(client: APIClient, requests: int) -> Dict[str, float]:
+    """Returns the median milliseconds of requests round trips of every route with client"""
+    cache.clear()
+    results = {}
+
+    new_games(1000)
+    results['list_ms'] = measure(lambda number: client.get(BASE_URL), requests)
+    results['list_guesses_ms'] = measure(lambda number: client.get(BASE_URL, {'fields': 'id,guesses'}), requests)
+    results['create_ms'] = measure(
+        lambda number: client.post(BASE_URL, {'num_slots': 4, 'num_colors': 6}, format='json'), requests)
+    results['batch_ms'] = measure(
+        lambda number: client.post(BASE_URL + 'batch/', {'count': 100, 'num_slots': 4, 'num_colors': 6},
+                                   format='json'), requests)
+
+    ids = new_games(requests)
+    for id in ids:
+        client.post('%s%d/guesses/' % (BASE_URL, id), {'code': MISS}, format='json')
+    results['retrieve_ms'] = measure(lambda number: client.get('%s%d/' % (BASE_URL, ids[0])), requests)
+    etag = client.get('%s%d/' % (BASE_URL, ids[0]))['ETag']
+    results['retrieve_not_modified_ms'] = measure(
+        lambda number: client.get('%s%d/' % (BASE_URL, ids[0]), HTTP_IF_NONE_MATCH=etag), requests)
+    results['stats_ms'] = measure(lambda number: client.get(BASE_URL + 'stats/'), requests)
+    results['hint_ms'] = measure(lambda number: client.get('%s%d/hint/' % (BASE_URL, ids[number])), requests)
+
+    ids = new_games(requests)
+    results['guess_ms'] = measure(
+        lambda number: client.post('%s%d/guesses/' % (BASE_URL, ids[number]), {'code': MISS}, format='json'),
+        requests)
+    results['guess_batch_ms'] = measure(
+        lambda number: client.post('%s%d/guesses/batch/' % (BASE_URL, ids[number]), {'codes': [MISS] * 10},
+                                   format='json'), requests)
+    return results
@@ -0,0 +1,94 @@
+"""
+Cost of hydrating domain games from stored games and guesses, with the slotted Game
+and Guess compared against the dict-backed classes they replaced, which rebuilt the
+palette of every game and copied every guess.
+
+    python -m mastermind_py.mastermind.benchmarks.domain
+"""
+import random
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+from pydash import py_
+
+from mastermind_py.mastermind.benchmarks import best_of, setup
+from mastermind_py.mastermind.domain import Game, GameStatus, colors
+
+
+class LegacyGuess:
+    """The original dict-backed Guess, kept as a baseline"""
+    def __init__(self, id: Any, code: List[str], black_pegs: int, white_pegs: int):
+        self.id = id
+        self.code = code
+        self.black_pegs = black_pegs
+        self.white_pegs = white_pegs
+
+
+class LegacyGame:
+    """The original dict-backed Game, kept as a baseline"""
+    def __init__(self, id: Any, reference: str, num_slots: int, num_colors: int,
+                 secret_code: List[str], max_guesses: int, status: str, guesses: List[LegacyGuess]):
+        self.id = id
+        self.reference = reference
+        self.num_slots = num_slots
+        self.num_colors = num_colors
+        self.secret_code = secret_code
+        self.max_guesses = max_guesses
+        self.status = status
+        self.colors = py_.take(colors, num_colors)
+        self.guesses = guesses
+
+    @staticmethod
+    def fromSchema(gameSchema: Any, guesses: List[Any]) -> "LegacyGame":
+        game_guesses = []
+        for guess in guesses:
+            game_guesses.append(LegacyGuess(guess.id, guess.code, guess.black_pegs, guess.white_pegs))
+        return LegacyGame(gameSchema.id, gameSchema.reference, gameSchema.num_slots, gameSchema.num_colors,
+                          gameSchema.secret_code, gameSchema.max_guesses, gameSchema.status, game_guesses)
+
+
+def retained_bytes(function: Callable[[], Any]) -> int:
+    """Returns the memory allocated by function that is still referenced by its result"""
+    tracemalloc.start()
+    try:
+        result = function()
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return size
+
+
+def run(count: int = 10000, guesses: int = 8) -> Dict[str, float]:
+    """
+    Hydrates count stored games of guesses guesses each with both implementations and
+    returns the games per second and the bytes retained per game of each one
+    """
+    # Models can only be imported once Django is set up, which __main__ does after the imports
+    from mastermind_py.mastermind.models import GameModel, GuessModel
+
+    rng = random.Random(0)
+    palette = colors[:6]
+    stored = []
+    for id in range(count):
+        game = GameModel(id=id, reference='', num_slots=4, num_colors=6, max_guesses=10,
+                         secret_code=rng.choices(palette, k=4), status=GameStatus.RUNNING, guess_count=guesses)
+        stored.append((game, [GuessModel(id=id * guesses + index, game_id=id, code=rng.choices(palette, k=4),
+                                         black_pegs=0, white_pegs=0) for index in range(guesses)]))
+
+    implementations = {
+        'legacy': lambda: [LegacyGame.fromSchema(game, game_guesses) for game, game_guesses in stored],
+        'slotted': lambda: [Game.fromSchema(game, game_guesses) for game, game_guesses in stored],
+    }
+    results = {}
+    for name, hydrate in implementations.items():
+        results['%s_games_per_s' % name] = count / best_of(hydrate, 1)
+        results['%s_bytes_per_game' % name] = retained_bytes(hydrate) / count
+    return results
+
+
+if __name__ == '__main__':
+    setup()
+
+    for name, value in run().items():
+        print('%-24s %12.1f' % (name, value))
@@ -0,0 +1,74 @@
+"""
+Compares the histogram feedback kernel against the nested loop implementation that
+Game._feedback used before it.
+
+    python -m mastermind_py.mastermind.benchmarks.feedback
+"""
+import random
+from typing import Dict, List, Tuple
+
+from mastermind_py.mastermind.benchmarks import best_of, setup
+from mastermind_py.mastermind.domain import Game, GameStatus, colors
+
+
+def legacy_feedback(secret_code: List[str], code: List[str]) -> Tuple[int, int]:
+    """The original nested loop implementation of Game._feedback, kept as a baseline"""
+    black_pegs = 0
+    white_pegs = 0
+    if secret_code == code:
+        black_pegs = len(secret_code)
+    else:
+        color_ocurrences = {}
+        for color in secret_code:
+            if not [gr for gr in color_ocurrences if color in gr]:
+                color_ocurrences[color] = secret_code.count(color)
+
+        for x in range(len(code)):
+            guess = code[x]
+            is_white_peg = False
+            for y in range(len(secret_code)):
+                if guess == secret_code[y]:
+                    if x == y:
+                        black_pegs += 1
+                        if color_ocurrences[guess] == 0 or is_white_peg:
+                            white_pegs -= 1
+                        else:
+                            color_ocurrences[guess] -= 1
+                        break
+                    else:
+                        if color_ocurrences[guess] != 0 and not is_white_peg:
+                            white_pegs += 1
+                            color_ocurrences[guess] -= 1
+                            is_white_peg = True
+
+    return black_pegs, white_pegs
+
+
+def run(sizes: Tuple[Tuple[int, int], ...] = ((4, 6), (4, 8), (8, 8), (12, 8)),
+        pairs: int = 1000) -> Dict[str, float]:
+    """
+    Scores the same random (secret, guess) pairs with both implementations and returns
+    the microseconds per call of each one, for every number of slots and colors
+    """
+    rng = random.Random(0)
+    results = {}
+    for num_slots, num_colors in sizes:
+        palette = colors[:num_colors]
+        games = []
+        for _ in range(pairs):
+            secret_code = rng.choices(palette, k=num_slots)
+            games.append((Game(None, '', num_slots, num_colors, secret_code, 10, GameStatus.RUNNING, []),
+                          rng.choices(palette, k=num_slots)))
+
+        legacy = best_of(lambda: [legacy_feedback(game.secret_code, code) for game, code in games], 1)
+        kernel = best_of(lambda: [game._feedback(code) for game, code in games], 1)
+        results['legacy_%dx%d' % (num_slots, num_colors)] = legacy / pairs * 1e6
+        results['kernel_%dx%d' % (num_slots, num_colors)] = kernel / pairs * 1e6
+    return results
+
+
+if __name__ == '__main__':
+    setup()
+
+    for name, microseconds in run().items():
+        print('%-16s %8.2f us/call' % (name, microseconds))
@@ -0,0 +1,52 @@
+"""
+Cost of creating games one by one through Games.save compared with Games.save_all,
+which inserts them with bulk_create, and of storing guesses with Guesses.save and
+Guesses.save_all. Needs a database, run it with
+
+    python manage.py benchmark repo
+"""
+import time
+from typing import Dict, Tuple
+
+from mastermind_py.mastermind.benchmarks import best_of
+from mastermind_py.mastermind.domain import Game, colors, create_reference, create_references
+from mastermind_py.mastermind.repo import Games, Guesses
+
+
+def run(count: int = 10000, batch_sizes: Tuple[int, ...] = (100, 1000, 5000)) -> Dict[str, float]:
+    """
+    Returns the games per second of every way of creating count games, the
+    milliseconds each batch insert takes, and the guesses per second of every way of
+    storing them
+    """
+    results = {}
+    results['create_reference_per_s'] = 1 / best_of(create_reference, 1000)
+    results['game_new_per_s'] = 1 / best_of(lambda: Game.new(4, 6, 10), 1000)
+    results['create_references_per_s'] = count / best_of(lambda: create_references(count), 1)
+
+    sample = Game.new_batch(count // 20, 4, 6, 10)
+    start = time.perf_counter()
+    for game in sample:
+        Games().save(game)
+    results['save_games_per_s'] = len(sample) / (time.perf_counter() - start)
+
+    for batch_size in batch_sizes:
+        games = Game.new_batch(count, 4, 6, 10)
+        start = time.perf_counter()
+        Games().save_all(games, batch_size=batch_size)
+        elapsed = time.perf_counter() - start
+        results['save_all_%d_games_per_s' % batch_size] = count / elapsed
+        results['save_all_%d_ms_per_batch' % batch_size] = elapsed / (count / batch_size) * 1e3
+
+    game = Game.new(4, 6, count)
+    game_model = Games().save(game)
+    guesses, _ = game.add_guesses([[colors[6]] * 4] * (count // 20))
+    start = time.perf_counter()
+    for guess in guesses:
+        Guesses().save(guess, game_model)
+    results['save_guesses_per_s'] = len(guesses) / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    Guesses().save_all(guesses, game_model)
+    results['save_all_guesses_per_s'] = len(guesses) / (time.perf_counter() - start)
+    return results
@@ -0,0 +1,44 @@
+"""
+Throughput, in scored (guess, secret) pairs per second, of feedback.score_matrix
+compared with calling Game._feedback once per pair.
+
+    python -m mastermind_py.mastermind.benchmarks.score_matrix
+"""
+import numpy as np
+from typing import Dict, Tuple
+
+from mastermind_py.mastermind.benchmarks import best_of, setup
+from mastermind_py.mastermind.domain import Game, GameStatus, colors
+from mastermind_py.mastermind.feedback import score_matrix
+
+
+def run(sizes: Tuple[Tuple[int, int], ...] = ((4, 6), (4, 8), (8, 8)),
+        guesses: int = 1000, secrets: int = 1000) -> Dict[str, float]:
+    """
+    Returns the pairs per second of the batch API and of the per game loop, the
+    loop is timed on a sample of the guesses to keep the run short
+    """
+    rng = np.random.RandomState(0)
+    results = {}
+    for num_slots, num_colors in sizes:
+        guess_codes = rng.randint(0, num_colors, size=(guesses, num_slots))
+        secret_codes = rng.randint(0, num_colors, size=(secrets, num_slots))
+
+        batch = best_of(lambda: score_matrix(guess_codes, secret_codes, num_colors), 1)
+
+        sample = [[colors[color] for color in code] for code in guess_codes[:20]]
+        games = [Game(None, '', num_slots, num_colors, [colors[color] for color in code], 10,
+                      GameStatus.RUNNING, []) for code in secret_codes]
+        loop = best_of(lambda: [game._feedback(code) for code in sample for game in games], 1, repeat=3)
+
+        name = '%dx%d' % (num_slots, num_colors)
+        results['score_matrix_%s_per_s' % name] = guesses * secrets / batch
+        results['feedback_loop_%s_per_s' % name] = len(sample) * secrets / loop
+    return results
+
+
+if __name__ == '__main__':
+    setup()
+
+    for name, pairs_per_second in run().items():
+        print('%-28s %14.0f pairs/s' % (name, pairs_per_second))
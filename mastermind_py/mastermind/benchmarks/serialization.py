@@ -0,0 +1,61 @@
+"""
+Cost of serializing the responses of the hot endpoints, the games list and a guess,
+with the marshmallow dumps and JSONRenderer compared against the compiled dumps and
+CompactJSONRenderer that replaced them.
+
+    python -m mastermind_py.mastermind.benchmarks.serialization
+"""
+from typing import Dict
+
+from rest_framework.renderers import JSONRenderer
+
+from mastermind_py.mastermind.benchmarks import best_of, setup
+from mastermind_py.mastermind.domain import Game, Guess
+
+
+def run(games: int = 100, guesses: int = 8) -> Dict[str, float]:
+    """
+    Returns the microseconds it takes to dump and render a page of games and the
+    response of a guess with guesses guesses, the old way and the compiled way
+    """
+    # The renderers read the settings of Django, which __main__ sets up after the imports
+    from mastermind_py.mastermind.renderers import CompactJSONRenderer
+    from mastermind_py.mastermind.schemas import GameSchema, GuessSchema, dump_game, dump_games, dump_guesses
+
+    page = Game.new_batch(games, 4, 6, 10)
+    for id, game in enumerate(page):
+        game.id = id
+    game = page[0]
+    game.guesses = [Guess(id, ['red', 'blue', 'green', 'yellow'], 1, 2) for id in range(guesses)]
+
+    def marshmallow_guess():
+        guesses = GuessSchema(many=True).dump(game.guesses)
+        result, _ = GameSchema().dump(game)
+        result['guesses'] = guesses.data
+        return result
+
+    def compiled_guess():
+        result = dump_game(game)
+        result['guesses'] = dump_guesses(game.guesses)
+        return result
+
+    cases = {
+        'list': (lambda: {'results': GameSchema(many=True).dump(page).data, 'next': None},
+                 lambda: {'results': dump_games(page), 'next': None}),
+        'guess': (marshmallow_guess, compiled_guess),
+    }
+    results = {}
+    for name, (marshmallow, compiled) in cases.items():
+        data = compiled()
+        results['%s_marshmallow_dump_us' % name] = best_of(marshmallow, 100) * 1e6
+        results['%s_compiled_dump_us' % name] = best_of(compiled, 100) * 1e6
+        results['%s_json_render_us' % name] = best_of(lambda: JSONRenderer().render(data), 100) * 1e6
+        results['%s_compact_render_us' % name] = best_of(lambda: CompactJSONRenderer().render(data), 100) * 1e6
+    return results
+
+
+if __name__ == '__main__':
+    setup()
+
+    for name, microseconds in run().items():
+        print('%-28s %10.1f us' % (name, microseconds))
@@ -0,0 +1,50 @@
+"""
+Latency of solver.best_guess, the engine behind the hint endpoint, playing whole
+games for several configurations. Build the feedback tables first to measure the
+table backed path.
+
+    python -m mastermind_py.mastermind.benchmarks.solver
+"""
+import time
+import numpy as np
+from typing import Dict, Tuple
+
+from mastermind_py.mastermind import feedback, solver
+from mastermind_py.mastermind.benchmarks import setup
+
+
+def run(sizes: Tuple[Tuple[int, int], ...] = ((4, 6), (4, 8), (5, 8), (6, 8)), games: int = 10) -> Dict[str, float]:
+    """
+    Returns the mean and worst hint latency in milliseconds, and the mean number of
+    guesses needed to win, for every configuration
+    """
+    rng = np.random.RandomState(0)
+    results = {}
+    for num_slots, num_colors in sizes:
+        latencies = []
+        turns = []
+        for _ in range(games):
+            secret_code = rng.randint(0, num_colors, size=num_slots).tolist()
+            history = []
+            for turn in range(1, 21):
+                start = time.perf_counter()
+                code = solver.best_guess(num_slots, num_colors, history, seed=turn)
+                latencies.append(time.perf_counter() - start)
+                black_pegs, white_pegs = feedback.score(secret_code, code, num_colors)
+                if black_pegs == num_slots:
+                    break
+                history.append((code, black_pegs, white_pegs))
+            turns.append(turn)
+
+        name = '%dx%d' % (num_slots, num_colors)
+        results['hint_mean_ms_%s' % name] = float(np.mean(latencies)) * 1e3
+        results['hint_max_ms_%s' % name] = float(np.max(latencies)) * 1e3
+        results['guesses_%s' % name] = float(np.mean(turns))
+    return results
+
+
+if __name__ == '__main__':
+    setup()
+
+    for name, value in run().items():
+        print('%-22s %8.2f' % (name, value))
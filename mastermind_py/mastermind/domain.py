@@ -1,9 +1,16 @@
+import functools
+import os
 import random
 import uuid
-from mastermind_py.mastermind.schemas import GameSchema, GuessSchema
+from mastermind_py.mastermind import feedback, solver
 
+import numpy as np
 from pydash import py_
-from typing import Any, List, Tuple
+from typing import TYPE_CHECKING, Any, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    # Only for the annotations, the schemas import MAX_SLOTS from this module
+    from mastermind_py.mastermind.schemas import GameSchema, GuessSchema
 
 
 class Colors:
@@ -21,6 +28,55 @@ class Colors:
 colors = [Colors.RED, Colors.BLUE, Colors.GREEN, Colors.YELLOW, Colors.ORANGE,
           Colors.WHITE, Colors.PURPLE, Colors.TURQUOISE]
 
+# Position of every color in the palette. Colors outside of it share one extra index,
+# so they never match anything in a secret code drawn from the palette
+color_indexes = {color: index for index, color in enumerate(colors)}
+UNKNOWN_COLOR = len(colors)
+
+
+@functools.lru_cache(maxsize=None)
+def palette(num_colors: int) -> Tuple[str, ...]:
+    """Returns the colors of a game of num_colors, shared by every game of that size"""
+    return tuple(py_.take(colors, num_colors))
+
+
+def encode_code(code: List[str]) -> List[int]:
+    """Transform a list of color names into a list of palette indexes"""
+    return [color_indexes.get(color, UNKNOWN_COLOR) for color in code]
+
+
+# Codes are stored packed in 4 bits per color, which fit up to MAX_SLOTS colors in a
+# bigint, see pack_code
+MAX_SLOTS = 15
+UNKNOWN_COLOR_NAME = 'unknown'
+
+
+def is_valid_code(code: List[str]) -> bool:
+    """Checks if a code can be stored: at most MAX_SLOTS colors of the palette"""
+    return len(code) <= MAX_SLOTS and all(color in color_indexes for color in code)
+
+
+def pack_code(code: List[str]) -> int:
+    """
+    Packs a code into a single int of 4 bits per color, the first color in the lowest
+    ones. Colors are stored as their palette index plus one, so the code ends at the
+    first 0
+    """
+    packed = 0
+    for color in reversed(encode_code(code)):
+        packed = packed << 4 | color + 1
+    return packed
+
+
+def unpack_code(packed: int) -> List[str]:
+    """Inverse of pack_code, colors outside of the palette are unpacked as UNKNOWN_COLOR_NAME"""
+    code = []
+    while packed:
+        index = (packed & 15) - 1
+        code.append(colors[index] if index < len(colors) else UNKNOWN_COLOR_NAME)
+        packed >>= 4
+    return code
+
 
 class GameStatus:
     RUNNING = 'running'
@@ -40,17 +96,35 @@ def create_reference():
     stream_name = random_uuid.hex[:int(len(random_uuid.hex) / divider)]
     return stream_name
 
+
+def create_references(count: int) -> List[str]:
+    """Generate several references at once.
+
+    Same format as create_reference, 10 random hex characters, but the random bytes
+    of every reference are read from the OS in a single call
+    """
+    length = 10  # The characters create_reference keeps from a UUID4
+    random_hex = os.urandom(count * length // 2).hex()
+    return [random_hex[start:start + length] for start in range(0, len(random_hex), length)]
+
 class Guess:
-    def __init__(self, id: Any, code: str, black_pegs: int, white_pegs: int):
+    __slots__ = ('id', 'code', 'black_pegs', 'white_pegs')
+
+    def __init__(self, id: Any, code: List[str], black_pegs: int, white_pegs: int):
         self.id = id
         self.code = code
         self.black_pegs = black_pegs
         self.white_pegs = white_pegs
 
 class Game:
+    # Games are hydrated by the thousand for analytics, slots keep them small
+    __slots__ = ('id', 'reference', 'num_slots', 'num_colors', 'secret_code', 'max_guesses', 'status',
+                 'colors', 'guesses', 'guess_count', 'version', '_encoded_secret_code')
+
     def __init__(self, id: Any, reference: str, num_slots: int, num_colors: int,
                  secret_code: List[str], max_guesses: int,
-                 status: GameStatus, guesses: List[Guess]):
+                 status: GameStatus, guesses: List[Guess], guess_count: Optional[int] = None,
+                 version: int = 1):
         self.id = id
         self.reference = reference
         self.num_slots = num_slots
@@ -58,9 +132,31 @@ class Game:
         self.secret_code = secret_code
         self.max_guesses = max_guesses
         self.status = status
-        self.colors = py_.take(colors, num_colors)
+        self.colors = palette(num_colors)
         self.guesses = guesses
-        
+        # Stored along the game, so the status of a game does not depend on its guesses
+        # being loaded
+        self.guess_count = len(guesses) if guess_count is None else guess_count
+        # Every guess is a new version of the game
+        self.version = version
+        self._encoded_secret_code = None  # type: Optional[List[int]]
+
+    @property
+    def code_colors(self) -> int:
+        """
+        Colors the codes of the game are made of: num_colors, but at most the colors of
+        the palette, the size of the code space of the solver and the feedback tables
+        """
+        return len(self.colors)
+
+    @property
+    def last_black_pegs(self) -> Optional[int]:
+        return self.guesses[-1].black_pegs if self.guesses else None
+
+    @property
+    def last_white_pegs(self) -> Optional[int]:
+        return self.guesses[-1].white_pegs if self.guesses else None
+
     def add_guess(self, code: List[str]) -> Tuple[Guess, GameStatus]:
         """
         Adds a new guess to the game, and updates the status of the game depending on
@@ -71,75 +167,114 @@ class Game:
         else:            
             black_pegs, white_pegs = self._feedback(code)
             guess = Guess(None, code, black_pegs, white_pegs)
-            if black_pegs == 4:
+            self.guesses.append(guess)
+            self.guess_count += 1
+            self.version += 1
+            if black_pegs == self.num_slots:
                 self.status = GameStatus.WON
             else:
-                if self.max_guesses <= len(self.guesses) + 1:
+                if self.max_guesses <= self.guess_count:
                     self.status = GameStatus.LOST
             return [guess, self.status]
-        # TODO: Implement this. Call the _feedback function, and update the status of the game
-        # depending on the result
+
+    def add_guesses(self, codes: List[List[str]]) -> Tuple[List[Guess], GameStatus]:
+        """
+        Adds several guesses to the game in order, stopping at the first one that
+        finishes it. Returns the guesses that were added and the final status.
+        """
+        guesses = []
+        for code in codes:
+            guess, status = self.add_guess(code)
+            guesses.append(guess)
+            if status != GameStatus.RUNNING:
+                break
+        return guesses, self.status
 
     def _feedback(self, code: List[str]) -> Tuple[int, int]:
         """
         Compares the given code with the secret code of the game, and returns a tuple
         of the number of (black_pegs, white_pegs)
         """
-        # TODO: Implement this
-        black_pegs = 0
-        white_pegs = 0
-        # If secret_code is equal to guess, it is not needed to iterate.
-        if self.secret_code == code:
-            black_pegs = 4
-        else:
-            # First, We need to create a dict with color ocurrences in secret code
-            color_ocurrences = {}
-            for color in self.secret_code:
-                if not [gr for gr in color_ocurrences if color in gr]:
-                    color_ocurrences[color] = self.secret_code.count(color)
-
-            # Then iterate checking code color and position
-            ### Nested loop has a huge cost, but in this case both arrays are short, so it is not a problem
-            for x in range(len(code)):
-                guess = code[x]
-                is_white_peg = False
-                for y in range(len(self.secret_code)):
-                    if guess == self.secret_code[y]:
-                        if x == y:
-                            black_pegs += 1
-                            # if color ocurrence is 0 means that it encounter before and if is_white_peg means it encounter in this iteration,
-                            # so we have to reduce white_pegs
-                            if color_ocurrences[guess] == 0 or is_white_peg:
-                                white_pegs -= 1
-                            else:
-                                color_ocurrences[guess] -= 1
-                            break
-                        else:
-                            # if is_white_peg is True, means already encounter another one, so it have not to count it again
-                            if color_ocurrences[guess] != 0 and not is_white_peg:
-                                white_pegs += 1
-                                color_ocurrences[guess] -= 1
-                                is_white_peg = True
-
-        return black_pegs, white_pegs 
+        if self._encoded_secret_code is None:
+            self._encoded_secret_code = encode_code(self.secret_code)
+        secret_code = self._encoded_secret_code
+        encoded = encode_code(code)
+        table = feedback.load_table(self.num_slots, self.code_colors)
+        if table is not None and self._in_table(secret_code) and self._in_table(encoded):
+            secret_index = feedback.code_index(secret_code, self.code_colors)
+            code_index = feedback.code_index(encoded, self.code_colors)
+            value = table[secret_index, code_index]
+            return feedback.unpack(value, self.num_slots)
+        return feedback.score(secret_code, encoded, UNKNOWN_COLOR + 1)
+
+    def _in_table(self, code: List[int]) -> bool:
+        """Checks if an encoded code belongs to the configuration of the game"""
+        return len(code) == self.num_slots and max(code) < self.code_colors
+
+    def candidates(self) -> Optional[np.ndarray]:
+        """
+        Returns the code_index of every code consistent with the feedback of the
+        guesses, or None when the configuration is too large to enumerate
+        """
+        if self.code_colors ** self.num_slots > solver.MAX_CODES:
+            return None
+        return solver.consistent(self.num_slots, self.code_colors, self._history(), None)[1]
+
+    def narrow(self, candidates: np.ndarray, guess: Guess) -> np.ndarray:
+        """
+        Returns the candidates, as returned by candidates, that are also consistent
+        with the feedback of a new guess
+        """
+        code = encode_code(guess.code)
+        if len(code) != self.num_slots:
+            return candidates
+        codes = feedback.all_codes(self.num_slots, self.code_colors)[candidates]
+        return solver.narrow(codes, candidates, code, guess.black_pegs, guess.white_pegs,
+                             self.num_slots, self.code_colors)[1]
+
+    def hint(self, candidates: Optional[np.ndarray] = None) -> List[str]:
+        """
+        Returns the best next guess for the game given the feedback received by the
+        previous guesses. candidates, as returned by the candidates method, saves
+        filtering them again from the guesses
+        """
+        code = solver.best_guess(self.num_slots, self.code_colors, self._history(),
+                                 seed=len(self.guesses), candidates=candidates)
+        return [self.colors[color] for color in code]
+
+    def _history(self) -> solver.History:
+        """Returns the encoded code and pegs of every guess that fits in the game"""
+        history = []
+        for guess in self.guesses:
+            code = encode_code(guess.code)
+            if len(code) == self.num_slots:
+                history.append((code, guess.black_pegs, guess.white_pegs))
+        return history
 
     @staticmethod
     def new(num_slots: int, num_colors: int, max_guesses: int) -> "Game":
         reference = create_reference().upper()
-        chosen_colors = py_.take(colors, num_colors)
-        secret_code = random.choices(chosen_colors, k=num_slots)
+        secret_code = random.choices(palette(num_colors), k=num_slots)
         return Game(None, reference, num_slots, num_colors,
                     secret_code, max_guesses, GameStatus.RUNNING,
                     [])
 
     @staticmethod
-    def fromSchema(gameSchema: GameSchema, guesses: List[GuessSchema]):
-        """Transform from GameSchema to Game"""
-        game_guesses = []
-        if guesses is not None:
-            for guess in guesses:
-                game_guesses.append(Guess(guess.id, guess.code, guess.black_pegs, guess.white_pegs))
-        return Game(gameSchema.id, gameSchema.reference, 
-        gameSchema.num_slots, gameSchema.num_colors, gameSchema.secret_code, 
-        gameSchema.max_guesses, gameSchema.status, game_guesses)
+    def new_batch(count: int, num_slots: int, num_colors: int, max_guesses: int) -> List["Game"]:
+        """Creates several new games with the same configuration"""
+        chosen_colors = palette(num_colors)
+        return [Game(None, reference.upper(), num_slots, num_colors,
+                     random.choices(chosen_colors, k=num_slots), max_guesses, GameStatus.RUNNING,
+                     [])
+                for reference in create_references(count)]
 
+    @staticmethod
+    def fromSchema(gameSchema: "GameSchema", guesses: List["GuessSchema"]):
+        """
+        Transform from GameSchema to Game. The guesses are kept as they are, any object
+        with the attributes of a Guess is one, only the list is copied
+        """
+        return Game(gameSchema.id, gameSchema.reference,
+        gameSchema.num_slots, gameSchema.num_colors, gameSchema.secret_code,
+        gameSchema.max_guesses, gameSchema.status, list(guesses) if guesses is not None else [],
+        gameSchema.guess_count, gameSchema.version)
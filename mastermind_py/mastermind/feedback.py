@@ -0,0 +1,147 @@
+import functools
+import os
+import numpy as np
+from django.conf import settings
+from typing import Optional, Sequence, Tuple, Union
+
+# Integer encoded codes, one per row
+Codes = Union[np.ndarray, Sequence[Sequence[int]]]
+
+
+def score(secret_code: Sequence[int], code: Sequence[int], num_colors: int) -> Tuple[int, int]:
+    """
+    Compares two integer encoded codes and returns a tuple of (black_pegs, white_pegs).
+
+    Colors must be encoded as integers in the range [0, num_colors). Black pegs are
+    counted in a single pass over the slots, the pegs that do not match in position are
+    accumulated into one histogram per code, and the white pegs are the overlap of
+    both histograms, so the cost is O(num_slots + num_colors) instead of the
+    O(num_slots ** 2) of comparing every slot against every other one.
+    """
+    black_pegs = 0
+    secret_histogram = [0] * num_colors
+    code_histogram = [0] * num_colors
+    for secret_color, color in zip(secret_code, code):
+        if secret_color == color:
+            black_pegs += 1
+        else:
+            secret_histogram[secret_color] += 1
+            code_histogram[color] += 1
+
+    white_pegs = 0
+    for secret_count, count in zip(secret_histogram, code_histogram):
+        white_pegs += secret_count if secret_count < count else count
+
+    return black_pegs, white_pegs
+
+
+def color_counts(codes: np.ndarray, num_colors: int) -> np.ndarray:
+    """
+    Returns a (len(codes), num_colors) array with how many times each color appears
+    in every code of a 2D array of integer encoded codes
+    """
+    counts = np.empty((codes.shape[0], num_colors), dtype=np.uint8)
+    for color in range(num_colors):
+        counts[:, color] = (codes == color).sum(axis=1)
+    return counts
+
+
+def score_matrix(guesses: Codes, secrets: Codes, num_colors: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Scores every guess against every secret code and returns two (len(guesses),
+    len(secrets)) arrays with the black and the white pegs of each pair.
+
+    The same histogram method as score, but every step is a whole-array operation:
+    one comparison per slot to count black pegs and one minimum per color to count
+    the colors both codes have in common, so no Python code runs per pair.
+    """
+    guess_codes = np.asarray(guesses, dtype=np.uint8)
+    secret_codes = np.asarray(secrets, dtype=np.uint8)
+
+    black_pegs = np.zeros((guess_codes.shape[0], secret_codes.shape[0]), dtype=np.uint8)
+    for slot in range(guess_codes.shape[1]):
+        black_pegs += guess_codes[:, slot, None] == secret_codes[None, :, slot]
+
+    guess_counts = color_counts(guess_codes, num_colors)
+    secret_counts = color_counts(secret_codes, num_colors)
+    common = np.zeros_like(black_pegs)
+    for color in range(num_colors):
+        common += np.minimum(guess_counts[:, color, None], secret_counts[None, :, color])
+
+    return black_pegs, common - black_pegs
+
+
+@functools.lru_cache(maxsize=None)
+def all_codes(num_slots: int, num_colors: int) -> np.ndarray:
+    """
+    Returns every possible code of a configuration as a read only (num_colors **
+    num_slots, num_slots) array, sorted so that the row of a code is its code_index
+    """
+    codes = np.indices((num_colors,) * num_slots, dtype=np.uint8).reshape(num_slots, -1).T
+    codes.flags.writeable = False
+    return codes
+
+
+def code_index(code: Sequence[int], num_colors: int) -> int:
+    """Returns the row of an integer encoded code in all_codes"""
+    index = 0
+    for color in code:
+        index = index * num_colors + color
+    return index
+
+
+def code_indexes(codes: np.ndarray, num_colors: int) -> np.ndarray:
+    """Returns the code_index of every code of a 2D array of integer encoded codes"""
+    return codes.astype(np.int64).dot(num_colors ** np.arange(codes.shape[1] - 1, -1, -1, dtype=np.int64))
+
+
+def pack(black_pegs: int, white_pegs: int, num_slots: int) -> int:
+    """Packs a (black_pegs, white_pegs) feedback into the single byte stored in the tables"""
+    return black_pegs * (num_slots + 1) + white_pegs
+
+
+def unpack(value: int, num_slots: int) -> Tuple[int, int]:
+    """Inverse of pack"""
+    black_pegs, white_pegs = divmod(int(value), num_slots + 1)
+    return black_pegs, white_pegs
+
+
+def table_path(num_slots: int, num_colors: int) -> str:
+    """Returns where the feedback table of a configuration is stored"""
+    return os.path.join(settings.FEEDBACK_TABLES_DIR, 'feedback_%dx%d.npy' % (num_slots, num_colors))
+
+
+def build_table(num_slots: int, num_colors: int, path: str, chunk_size: int = 1024) -> None:
+    """
+    Scores every code against every other code of a configuration and writes the
+    packed feedbacks into path as a (codes, codes) uint8 .npy file, where
+    table[code_index(secret), code_index(guess)] is the feedback of guess.
+
+    Rows are computed and written in chunks straight into the file, so building a
+    table never needs more memory than one chunk. The file is written next to path
+    and renamed, so processes that already mapped an older table keep their pages.
+    """
+    codes = all_codes(num_slots, num_colors)
+    tmp_path = path + '.tmp'
+    table = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.uint8, shape=(len(codes), len(codes)))
+    for start in range(0, len(codes), chunk_size):
+        black_pegs, white_pegs = score_matrix(codes[start:start + chunk_size], codes, num_colors)
+        table[start:start + chunk_size] = black_pegs * (num_slots + 1) + white_pegs
+    table.flush()
+    del table
+    os.replace(tmp_path, path)
+
+
+@functools.lru_cache(maxsize=None)
+def load_table(num_slots: int, num_colors: int) -> Optional[np.ndarray]:
+    """
+    Returns the feedback table of a configuration, or None if it was not built.
+
+    The table is memory-mapped read only, so the pages are loaded lazily and shared
+    through the page cache by every process of the machine that maps the same file.
+    Results are cached per process, restart the workers after building new tables.
+    """
+    path = table_path(num_slots, num_colors)
+    if not os.path.exists(path):
+        return None
+    return np.load(path, mmap_mode='r')
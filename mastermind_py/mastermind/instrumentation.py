@@ -0,0 +1,275 @@
+import bisect
+import collections
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, ContextManager, Dict, Iterator, Optional, Tuple
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+# Query budget of every endpoint, enforced by the tests
+BUDGETS_PATH = os.path.join(os.path.dirname(__file__), 'query_budgets.json')
+
+# Upper bounds, in seconds, of the buckets of the request duration histograms
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, float('inf'))
+# Methods with their own label, any other one is counted as "other"
+METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+# Redis hash where the workers add up their measures, when METRICS_CACHE is set
+METRICS_KEY = 'mastermind:metrics'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# Type and help of every metric, all of them prefixed with mastermind_
+FAMILIES = {
+    'http_requests_total': ('counter', 'Requests by route, method and status'),
+    'http_request_duration_seconds': ('histogram', 'Duration of the requests by route and method'),
+    'db_queries_total': ('counter', 'Database queries run by the requests'),
+    'db_duration_seconds_total': ('counter', 'Time the requests spent running database queries'),
+    'cache_hits_total': ('counter', 'Hits of the game cache'),
+    'cache_misses_total': ('counter', 'Misses of the game cache'),
+    'serialization_duration_seconds_total': ('counter', 'Time the requests spent serializing responses'),
+    'feedback_duration_seconds_total': ('counter', 'Time the requests spent scoring guesses'),
+}
+
+_local = threading.local()
+
+# Hits and misses of the game cache since the process started
+cache_totals = {'hits': 0, 'misses': 0}
+
+
+class RequestMetrics:
+    """
+    Measures of a single request: number of queries and time spent running them,
+    hits and misses of the game cache, and time spent serializing responses and
+    scoring guesses
+    """
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.serialization_time = 0.0
+        self.feedback_time = 0.0
+        # A request that starts inside an atomic block, the one of a test, has its
+        # ATOMIC_REQUESTS transaction turned into a savepoint at this depth, which is
+        # not a query in production
+        self.outer_savepoint_depth = len(connection.savepoint_ids) if connection.in_atomic_block else None
+
+    def __call__(self, execute, sql, params, many, context):
+        """
+        Database execute wrapper, counts and times every query, savepoints included,
+        but the one that stands for the transaction of the request in the tests
+        """
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            # A block is among the savepoint ids while it runs, not while its own
+            # savepoint is created, released or rolled back
+            if 'SAVEPOINT' not in sql[:32] or len(connection.savepoint_ids) != self.outer_savepoint_depth:
+                self.queries += 1
+                self.db_time += time.perf_counter() - start
+
+    def server_timing(self) -> str:
+        """Returns the measures in the format of the Server-Timing header"""
+        return ('db;dur=%.3f;desc="%d queries", cache;desc="%d hits %d misses", serialization;dur=%.3f, '
+                'feedback;dur=%.3f') % (self.db_time * 1e3, self.queries, self.cache_hits, self.cache_misses,
+                                        self.serialization_time * 1e3, self.feedback_time * 1e3)
+
+
+def current() -> Optional[RequestMetrics]:
+    """Returns the metrics of the request being handled by this thread, if any"""
+    return getattr(_local, 'metrics', None)
+
+
+def record_cache(hit: bool) -> None:
+    """Counts a hit or a miss of the game cache, for the process and the current request"""
+    cache_totals['hits' if hit else 'misses'] += 1
+    metrics = current()
+    if metrics is not None:
+        if hit:
+            metrics.cache_hits += 1
+        else:
+            metrics.cache_misses += 1
+
+
+@contextmanager
+def _timed(attribute: str) -> Iterator[None]:
+    """Adds the time spent in the block to an attribute of the metrics of the current request"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics = current()
+        if metrics is not None:
+            setattr(metrics, attribute, getattr(metrics, attribute) + time.perf_counter() - start)
+
+
+def serialization() -> ContextManager[None]:
+    """Adds the time spent in the block to the serialization time of the current request"""
+    return _timed('serialization_time')
+
+
+def feedback() -> ContextManager[None]:
+    """Adds the time spent in the block to the feedback time of the current request"""
+    return _timed('feedback_time')
+
+
+def load_budgets() -> Dict[str, Dict[str, Any]]:
+    """Returns the budget of every endpoint, by endpoint name"""
+    with open(BUDGETS_PATH) as budgets:
+        return json.load(budgets)
+
+
+class Registry:
+    """
+    Aggregates the measures of every request by route, for the metrics endpoint.
+
+    Every measure is an integer counter, durations are counted in microseconds, so
+    the gunicorn workers can add theirs up in a Redis hash with HINCRBY. Each worker
+    counts in memory, which only costs a lock and a few dict updates per request, and
+    when METRICS_CACHE is set adds its counters to the hash of that cache at most
+    every METRICS_FLUSH_INTERVAL seconds. Otherwise the counters of the process are
+    the metrics.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = collections.Counter()  # type: Dict[str, int]
+        self.flushed = time.monotonic()
+        # Keys of the counters of every (route, method), built once
+        self.keys = {}  # type: Dict[Tuple[str, str], Tuple[str, ...]]
+
+    def observe(self, method: str, route: str, status: int, duration: float, metrics: RequestMetrics) -> None:
+        """Counts a request that took duration seconds"""
+        method = method if method in METHODS else 'other'
+        keys = self.keys.get((route, method))
+        if keys is None:
+            keys = self.keys[route, method] = self._keys(route, method)
+        bucket = bisect.bisect_left(DURATION_BUCKETS, duration)
+        with self.lock:
+            counters = self.counters
+            counters['%s%d"' % (keys[0], status)] += 1
+            counters[keys[1 + bucket]] += 1
+            counters[keys[-7]] += int(duration * 1e6)
+            counters[keys[-6]] += metrics.queries
+            counters[keys[-5]] += int(metrics.db_time * 1e6)
+            counters[keys[-4]] += metrics.cache_hits
+            counters[keys[-3]] += metrics.cache_misses
+            counters[keys[-2]] += int(metrics.serialization_time * 1e6)
+            counters[keys[-1]] += int(metrics.feedback_time * 1e6)
+
+        if settings.METRICS_CACHE and time.monotonic() - self.flushed > settings.METRICS_FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self) -> None:
+        """Adds the counters of the process to the hash of METRICS_CACHE and resets them"""
+        with self.lock:
+            counters, self.counters = self.counters, collections.Counter()
+            self.flushed = time.monotonic()
+        try:
+            pipeline = self._redis().pipeline(transaction=False)
+            for key, value in counters.items():
+                if value:
+                    pipeline.hincrby(METRICS_KEY, key, value)
+            pipeline.execute()
+        except Exception:
+            # Metrics must never fail a request, they are kept for the next flush
+            logger.warning("Could not flush the metrics", exc_info=True)
+            with self.lock:
+                self.counters.update(counters)
+
+    def collect(self) -> Dict[str, int]:
+        """Returns the counters of every worker, or of this process without METRICS_CACHE"""
+        with self.lock:
+            counters = collections.Counter(self.counters)
+        if settings.METRICS_CACHE:
+            counters.update({key.decode(): int(value) for key, value in self._redis().hgetall(METRICS_KEY).items()})
+        return counters
+
+    def render(self) -> str:
+        """Returns the metrics in the Prometheus text format"""
+        samples = collections.defaultdict(list)  # type: Dict[str, list]
+        buckets = collections.defaultdict(list)  # type: Dict[str, list]
+        for key, value in sorted(self.collect().items()):
+            name, labels = key.split('|', 1)
+            if name == 'http_request_duration_seconds_bucket':
+                labels, bucket = labels.rsplit(',le=', 1)
+                buckets[labels].append((float(bucket.strip('"')), value))
+            else:
+                samples[name].append((labels, value / 1e6 if '_seconds' in name else value))
+
+        lines = []
+        for family, (kind, description) in FAMILIES.items():
+            lines.append('# HELP mastermind_%s %s' % (family, description))
+            lines.append('# TYPE mastermind_%s %s' % (family, kind))
+            if kind == 'histogram':
+                for labels, counts in sorted(buckets.items()):
+                    by_bucket = dict(counts)
+                    total = 0
+                    for bound in DURATION_BUCKETS:
+                        total += by_bucket.get(bound, 0)
+                        lines.append('mastermind_%s_bucket{%s,le="%s"} %d' % (
+                            family, labels, '+Inf' if bound == float('inf') else bound, total))
+                    lines.append('mastermind_%s_count{%s} %d' % (family, labels, total))
+                for labels, value in samples[family + '_sum']:
+                    lines.append('mastermind_%s_sum{%s} %s' % (family, labels, value))
+            else:
+                for labels, value in samples[family]:
+                    lines.append('mastermind_%s{%s} %s' % (family, labels, value))
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _keys(route: str, method: str) -> Tuple[str, ...]:
+        """
+        Keys of the counters of a route, in the order observe uses them: the prefix of
+        the requests by status, one per bucket, and one per measure
+        """
+        labels = 'route="%s",method="%s"' % (route, method)
+        # Buckets are counted apart and added up when rendered
+        buckets = tuple('http_request_duration_seconds_bucket|%s,le="%s"' % (labels, bucket)
+                        for bucket in DURATION_BUCKETS)
+        measures = ('http_request_duration_seconds_sum', 'db_queries_total', 'db_duration_seconds_total',
+                    'cache_hits_total', 'cache_misses_total', 'serialization_duration_seconds_total',
+                    'feedback_duration_seconds_total')
+        return ('http_requests_total|%s,status="' % labels,) + buckets + tuple(
+            '%s|%s' % (measure, labels) for measure in measures)
+
+    @staticmethod
+    def _redis():
+        from django_redis import get_redis_connection
+        return get_redis_connection(settings.METRICS_CACHE)
+
+
+# Measures of the requests handled by this process
+registry = Registry()
+
+
+class InstrumentationMiddleware:
+    """
+    Measures every request, reports the measures in the Server-Timing header, keeps
+    them in the metrics attribute of the response and counts them in the registry
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        _local.metrics = metrics
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(metrics):
+                response = self.get_response(request)
+        finally:
+            _local.metrics = None
+        duration = time.perf_counter() - start
+
+        # Routes are the patterns of urls.py, so the ids do not make a label each
+        route = request.resolver_match.route if request.resolver_match else 'unmatched'
+        registry.observe(request.method, route, response.status_code, duration, metrics)
+        response['Server-Timing'] = metrics.server_timing()
+        response.metrics = metrics
+        return response
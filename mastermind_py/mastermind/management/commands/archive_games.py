@@ -0,0 +1,36 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from mastermind_py.mastermind.repo import Archive
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves the games that finished more than --days days ago, with their "
+        "guesses, to the archive tables. Games are moved in chunks of --chunk-size, each "
+        "one in its own short transaction. Archived games can still be retrieved."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=float, default=30, help="Age of the games to archive")
+        parser.add_argument("--chunk-size", type=int, default=500, help="Games moved by every transaction")
+        parser.add_argument("--pause", type=float, default=0, help="Seconds to wait between chunks")
+
+    def handle(self, *args, **options):
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be positive")
+
+        archive = Archive()
+        finished_before = timezone.now() - datetime.timedelta(days=options["days"])
+        archived = 0
+        while True:
+            moved = archive.move(finished_before, options["chunk_size"])
+            archived += moved
+            if moved < options["chunk_size"]:
+                break
+            time.sleep(options["pause"])
+
+        self.stdout.write(self.style.SUCCESS("Archived %d games" % archived))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from mastermind_py.mastermind.repo import Stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the rollups of the stats endpoint from every stored game, archived or "
+        "not. Run it once to count the games stored before the rollups existed, the "
+        "requests keep them up to date afterwards."
+    )
+
+    def handle(self, *args, **options):
+        Stats().rebuild()
+        self.stdout.write(self.style.SUCCESS("Rebuilt the game stats"))
@@ -0,0 +1,75 @@
+import importlib
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from mastermind_py.mastermind.benchmarks import BENCHMARKS, compare
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs the benchmarks of mastermind_py.mastermind.benchmarks. They run against a "
+        "throwaway test database, created and destroyed like the one of the tests. "
+        "Results can be saved as JSON and compared against a saved baseline, the command "
+        "fails when a measure is worse than the baseline by more than the threshold."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "benchmarks", nargs="*", metavar="BENCHMARK",
+            help="Benchmarks to run, all of them by default: %s" % ", ".join(BENCHMARKS),
+        )
+        parser.add_argument("--save", metavar="PATH", help="Writes the results to PATH as JSON")
+        parser.add_argument("--compare", metavar="PATH", help="Compares the results with the baseline saved in PATH")
+        parser.add_argument(
+            "--threshold", type=float, default=0.1,
+            help="Relative change over which a worse measure is a regression, 0.1 by default",
+        )
+
+    def handle(self, *args, **options):
+        names = options["benchmarks"] or BENCHMARKS
+        unknown = set(names) - set(BENCHMARKS)
+        if unknown:
+            raise CommandError("Unknown benchmarks: %s" % ", ".join(sorted(unknown)))
+
+        baseline = None
+        if options["compare"]:
+            with open(options["compare"]) as baseline_file:
+                baseline = json.load(baseline_file)
+
+        results = {}
+        database_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            for name in names:
+                module = importlib.import_module("mastermind_py.mastermind.benchmarks.%s" % name)
+                self.stdout.write(self.style.MIGRATE_HEADING(name))
+                results[name] = module.run()
+                for measure, value in results[name].items():
+                    self.stdout.write("  %-32s %16.2f" % (measure, value))
+        finally:
+            connection.creation.destroy_test_db(database_name, verbosity=0)
+
+        if options["save"]:
+            with open(options["save"], "w") as results_file:
+                json.dump(results, results_file, indent=2, sort_keys=True)
+
+        if baseline is not None:
+            self.report(baseline, results, options["threshold"])
+
+    def report(self, baseline, results, threshold):
+        """Prints the change of every measure against the baseline and fails on regressions"""
+        self.stdout.write(self.style.MIGRATE_HEADING("compared with the baseline"))
+        regressions = 0
+        for name, measure, previous, value, change in compare(baseline, results):
+            line = "  %-48s %16.2f %16.2f %+8.1f%%" % (
+                "%s.%s" % (name, measure), previous, value, (value - previous) / previous * 100)
+            if change > threshold:
+                regressions += 1
+                self.stdout.write(self.style.ERROR(line + "  regression"))
+            else:
+                self.stdout.write(line)
+
+        if regressions:
+            raise CommandError("%d measures regressed by more than %d%%" % (regressions, threshold * 100))
@@ -0,0 +1,39 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from mastermind_py.mastermind import feedback
+
+
+class Command(BaseCommand):
+    help = (
+        "Precomputes the feedback of every code against every other code for the given "
+        "configurations and stores them in FEEDBACK_TABLES_DIR. A table takes "
+        "(num_colors ** num_slots) ** 2 bytes: 16 MB for 4x8, 1 GB for 5x8."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "configs", nargs="*", metavar="SLOTSxCOLORS",
+            help="Configurations to build, defaults to FEEDBACK_TABLE_CONFIGS",
+        )
+        parser.add_argument("--force", action="store_true", help="Rebuild tables that already exist")
+
+    def handle(self, *args, **options):
+        os.makedirs(settings.FEEDBACK_TABLES_DIR, exist_ok=True)
+        for config in options["configs"] or settings.FEEDBACK_TABLE_CONFIGS:
+            try:
+                num_slots, num_colors = (int(value) for value in config.lower().split("x"))
+            except ValueError:
+                raise CommandError("Invalid configuration '%s', expected SLOTSxCOLORS" % config)
+
+            path = feedback.table_path(num_slots, num_colors)
+            if os.path.exists(path) and not options["force"]:
+                self.stdout.write("%s already exists, skipping" % path)
+                continue
+
+            start = time.time()
+            feedback.build_table(num_slots, num_colors, path)
+            self.stdout.write(self.style.SUCCESS("Built %s in %.1fs" % (path, time.time() - start)))
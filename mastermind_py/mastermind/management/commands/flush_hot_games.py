@@ -0,0 +1,59 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from mastermind_py.mastermind.domain import Game, GameStatus
+from mastermind_py.mastermind.models import GameModel, GuessModel
+from mastermind_py.mastermind.repo import ConflictError, HotGames
+
+
+class Command(BaseCommand):
+    help = (
+        "Writes to the database the hot games that have been idle for "
+        "HOT_GAMES_IDLE_TIMEOUT seconds. Run it periodically, and with --all to recover "
+        "every hot game after a crash or before disabling HOT_GAMES."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="Flush every hot game, idle or not")
+        parser.add_argument("--chunk-size", type=int, default=1000, help="Running games read at once")
+
+    def handle(self, *args, **options):
+        hot_games = HotGames()
+        idle_since = time.time() - (0 if options["all"] else settings.HOT_GAMES_IDLE_TIMEOUT)
+        flushed = 0
+
+        # Every hot game is running in the database, they are the index of the store
+        running = GameModel.objects.filter(status=GameStatus.RUNNING).order_by("id").values_list("id", flat=True)
+        last_id = 0
+        while True:
+            ids = list(running.filter(id__gt=last_id)[:options["chunk_size"]])
+            if not ids:
+                break
+            last_id = ids[-1]
+
+            for id, cached in hot_games.get_many(ids).items():
+                if cached["updated"] > idle_since:
+                    continue
+                with hot_games.lock(id):
+                    # It may have been played or flushed since it was read
+                    state = hot_games.get(id)
+                    if state is None or state["updated"] > idle_since:
+                        continue
+                    guesses = [GuessModel(**guess) for guess in state["guesses"]]
+                    # A request that flushed the game and rolled back left ids of guesses
+                    # that were never stored, the ones past the count of the stored game
+                    stored = GameModel.objects.filter(id=id).values_list("guess_count", flat=True).first()
+                    for guess in guesses[stored:]:
+                        guess.id = None
+                    game = Game.fromSchema(GameModel(**state["game"]), guesses)
+                    try:
+                        hot_games.flush(game, state["game"]["registration_datetime"], state.get("stored_version"))
+                    except ConflictError:
+                        # Already written by the request that finished it
+                        hot_games.cache.delete(hot_games._key(id))
+                        continue
+                flushed += 1
+
+        self.stdout.write(self.style.SUCCESS("Flushed %d hot games" % flushed))
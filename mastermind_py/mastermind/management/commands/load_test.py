@@ -0,0 +1,164 @@
+import http.client
+import json
+import random
+import threading
+import time
+import numpy as np
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from mastermind_py.mastermind import solver
+
+STRATEGIES = ["random", "solver", "hint"]
+# Routes in the order they are reported, named like in query_budgets.json
+ROUTES = ["games.create", "guesses.create", "games.retrieve", "games.hint"]
+
+
+class Player:
+    """
+    A simulated player with its own connection, who creates games and plays them to
+    the end, polling the game after every guess like a client showing it would
+    """
+    def __init__(self, url: str, options: Dict[str, Any], seed: int):
+        parts = urlsplit(url)
+        connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        self.connection = connection_class(parts.netloc, timeout=options["timeout"])
+        self.path = parts.path.rstrip("/") + "/"
+        self.options = options
+        self.rng = random.Random(seed)
+        self.requests = {route: 0 for route in ROUTES}
+        self.latencies = {route: [] for route in ROUTES}  # type: Dict[str, List[float]]
+        self.errors = {route: 0 for route in ROUTES}
+        self.games = 0
+
+    def request(self, route: str, method: str, path: str, body: Any = None,
+                headers: Optional[Dict[str, str]] = None) -> Tuple[int, Any, Dict[str, str]]:
+        """
+        Sends a request and records its latency, returns the status, the decoded body
+        and the headers, or a status of 0 when the request could not be sent
+        """
+        headers = dict(headers or {})
+        if body is not None:
+            body = json.dumps(body)
+            headers["Content-Type"] = "application/json"
+
+        self.requests[route] += 1
+        start = time.perf_counter()
+        try:
+            self.connection.request(method, self.path + path, body=body, headers=headers)
+            response = self.connection.getresponse()
+            content = response.read()
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            self.errors[route] += 1
+            return 0, None, {}
+        self.latencies[route].append(time.perf_counter() - start)
+
+        if response.status >= 400:
+            self.errors[route] += 1
+        data = json.loads(content) if content and response.status < 400 else None
+        return response.status, data, dict(response.getheaders())
+
+    def play(self, games: int) -> None:
+        """Plays games games, a game that fails is abandoned and the next one started"""
+        for _ in range(games):
+            if self.play_game():
+                self.games += 1
+
+    def play_game(self) -> bool:
+        """Creates a game and plays it to the end, returns whether every request succeeded"""
+        options = self.options
+        status, game, _ = self.request("games.create", "POST", "", {
+            "num_slots": options["num_slots"], "num_colors": options["num_colors"],
+            "max_guesses": options["max_guesses"]})
+        if status != 201:
+            return False
+
+        palette = game["colors"]
+        history = []  # type: solver.History
+        etag = None
+        while game["status"] == "running":
+            code = self.next_code(game["id"], palette, history)
+            if code is None:
+                return False
+            status, game, _ = self.request("guesses.create", "POST", "%d/guesses/" % game["id"], {"code": code})
+            if status != 201:
+                return False
+            guess = game["guesses"][-1]
+            history.append(([palette.index(color) for color in code], guess["black_pegs"], guess["white_pegs"]))
+
+            for _ in range(options["polls"]):
+                status, _, headers = self.request("games.retrieve", "GET", "%d/" % game["id"],
+                                                  headers={"If-None-Match": etag} if etag else None)
+                if status not in (200, 304):
+                    return False
+                etag = headers.get("ETag", etag)
+        return True
+
+    def next_code(self, id: int, palette: List[str], history: solver.History) -> Optional[List[str]]:
+        """Chooses the next guess with the strategy of the options"""
+        strategy = self.options["strategy"]
+        if strategy == "random":
+            return self.rng.choices(palette, k=self.options["num_slots"])
+        if strategy == "solver":
+            code = solver.best_guess(self.options["num_slots"], len(palette), history, seed=self.rng.randrange(2 ** 31))
+            return [palette[color] for color in code]
+
+        status, hint, _ = self.request("games.hint", "GET", "%d/hint/" % id)
+        return hint["code"] if status == 200 else None
+
+
+class Command(BaseCommand):
+    help = (
+        "Plays games against a running server with concurrent simulated players, and "
+        "reports the throughput, the latency percentiles and the error rate of every "
+        "route. Start the server first, for instance gunicorn config.wsgi with the "
+        "production settings, and give its games URL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="http://localhost:8000/api/games/", help="Games URL of the server")
+        parser.add_argument("--players", type=int, default=10, help="Concurrent players")
+        parser.add_argument("--games", type=int, default=5, help="Games played by every player")
+        parser.add_argument(
+            "--strategy", choices=STRATEGIES, default="random",
+            help="How players choose their guesses: random codes, the solver on the client, or "
+                 "the hint endpoint of the server",
+        )
+        parser.add_argument("--polls", type=int, default=1, help="Retrieves of the game after every guess")
+        parser.add_argument("--num-slots", type=int, default=4)
+        parser.add_argument("--num-colors", type=int, default=6)
+        parser.add_argument("--max-guesses", type=int, default=10)
+        parser.add_argument("--timeout", type=float, default=30, help="Seconds to wait for a response")
+        parser.add_argument("--seed", type=int, default=0, help="Seed of the guesses of the players")
+
+    def handle(self, *args, **options):
+        if options["players"] < 1 or options["games"] < 1:
+            raise CommandError("--players and --games must be positive")
+
+        players = [Player(options["url"], options, options["seed"] + number) for number in range(options["players"])]
+        threads = [threading.Thread(target=player.play, args=(options["games"],)) for player in players]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        games = sum(player.games for player in players)
+        self.stdout.write("Played %d games in %.1f s, %.2f games/s" % (games, elapsed, games / elapsed))
+        self.stdout.write("  %-16s %9s %7s %8s %9s %9s %9s %9s" % (
+            "route", "requests", "errors", "error %", "req/s", "p50 ms", "p95 ms", "p99 ms"))
+        for route in ROUTES:
+            latencies = np.array([latency for player in players for latency in player.latencies[route]]) * 1e3
+            requests = sum(player.requests[route] for player in players)
+            errors = sum(player.errors[route] for player in players)
+            if not requests:
+                continue
+            # Requests that could not be sent have no latency
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if len(latencies) else (0, 0, 0)
+            line = "  %-16s %9d %7d %8.2f %9.1f %9.2f %9.2f %9.2f" % (
+                route, requests, errors, errors / requests * 100, requests / elapsed, p50, p95, p99)
+            self.stdout.write(self.style.ERROR(line) if errors else line)
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from mastermind_py.mastermind.simulation import STRATEGIES, simulate
+
+
+class Command(BaseCommand):
+    help = (
+        "Plays games offline with a guessing strategy across a pool of processes, and "
+        "reports the win rate, the distribution of the number of guesses and the games "
+        "per second. Runs with the same seed and chunk size give the same results."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("games", type=int, help="Number of games to play")
+        parser.add_argument(
+            "--strategy", default="minimax",
+            help="One of %s, or the dotted path of a Strategy" % ", ".join(STRATEGIES),
+        )
+        parser.add_argument("--num-slots", type=int, default=4)
+        parser.add_argument("--num-colors", type=int, default=6)
+        parser.add_argument("--max-guesses", type=int, default=10)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--processes", type=int, help="Worker processes, one per core by default")
+        parser.add_argument("--chunk-size", type=int, default=100, help="Games played by a worker at once")
+
+    def handle(self, *args, **options):
+        if options["games"] < 1 or options["chunk_size"] < 1:
+            raise CommandError("games and --chunk-size must be positive")
+        try:
+            simulation = simulate(options["games"], options["strategy"], options["num_slots"],
+                                  options["num_colors"], options["max_guesses"], options["seed"],
+                                  options["processes"], options["chunk_size"])
+        except ImportError as error:
+            raise CommandError("Unknown strategy %s: %s" % (options["strategy"], error))
+
+        self.stdout.write("Played %d games with %s in %.1f s, %.1f games/s" % (
+            simulation.games, simulation.strategy, simulation.elapsed, simulation.games_per_s))
+        self.stdout.write("  win rate      %8.2f%%" % (simulation.win_rate * 100))
+        self.stdout.write("  mean guesses  %9.3f" % simulation.mean_guesses)
+        for guesses, count in enumerate(simulation.outcomes):
+            if guesses and count:
+                self.stdout.write("  %2d guesses    %9d  %6.2f%%" % (guesses, count, count / simulation.games * 100))
+        lost = simulation.outcomes[0]
+        self.stdout.write("  lost          %9d  %6.2f%%" % (lost, lost / simulation.games * 100))
@@ -0,0 +1,21 @@
+# Generated by Django 2.2.2 on 2026-10-18 10:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mastermind', '0002_remove_guessmodel_a'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='gamemodel',
+            index=models.Index(fields=['registration_datetime', 'id'], name='game_registration_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gamemodel',
+            index=models.Index(fields=['status', 'registration_datetime', 'id'], name='game_status_registration_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 2.2.2 on 2026-10-18 12:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mastermind', '0003_game_registration_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gamemodel',
+            name='guess_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='gamemodel',
+            name='last_black_pegs',
+            field=models.PositiveIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='gamemodel',
+            name='last_white_pegs',
+            field=models.PositiveIntegerField(null=True),
+        ),
+        # Counts the guesses of the existing games and copies the pegs of their last one
+        migrations.RunSQL(
+            """
+            UPDATE mastermind_gamemodel AS game
+            SET guess_count = guesses.count, last_black_pegs = last.black_pegs, last_white_pegs = last.white_pegs
+            FROM (SELECT game_id, count(*) AS count, max(id) AS last_id
+                  FROM mastermind_guessmodel GROUP BY game_id) AS guesses
+            JOIN mastermind_guessmodel AS last ON last.id = guesses.last_id
+            WHERE game.id = guesses.game_id
+            """,
+            migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 2.2.2 on 2026-10-18 13:05
+
+from django.db import migrations
+import mastermind_py.mastermind.models
+
+# The palette when the codes were packed, the index of a color plus one is its
+# nibble and colors outside of it take the nibble after the last one
+PALETTE = "ARRAY['red', 'blue', 'green', 'yellow', 'orange', 'white', 'purple', 'turquoise']"
+PACK = (
+    "(SELECT coalesce(bit_or(coalesce(array_position({palette}, color), 9)::bigint << (4 * (slot - 1)::int)), 0) "
+    "FROM jsonb_array_elements_text({code}) WITH ORDINALITY AS code(color, slot) WHERE slot <= 15)"
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mastermind', '0004_game_guess_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gamemodel',
+            name='packed_secret_code',
+            field=mastermind_py.mastermind.models.CodeField(null=True),
+        ),
+        migrations.AddField(
+            model_name='guessmodel',
+            name='packed_code',
+            field=mastermind_py.mastermind.models.CodeField(null=True),
+        ),
+        # Secret codes are JSON arrays, guess codes the str of a Python list of strings.
+        # Packing drops the colors of the games and the names of the colors outside of
+        # the palette, so it is irreversible instead of unpacking codes that lost them
+        migrations.RunSQL(
+            "UPDATE mastermind_gamemodel SET packed_secret_code = %s"
+            % PACK.format(palette=PALETTE, code="secret_code"),
+            reverse_sql=None,
+        ),
+        migrations.RunSQL(
+            "UPDATE mastermind_guessmodel SET packed_code = %s"
+            % PACK.format(palette=PALETTE, code="replace(code, '''', '\"')::jsonb"),
+            reverse_sql=None,
+        ),
+        migrations.RemoveField(
+            model_name='gamemodel',
+            name='colors',
+        ),
+        migrations.RemoveField(
+            model_name='gamemodel',
+            name='secret_code',
+        ),
+        migrations.RemoveField(
+            model_name='guessmodel',
+            name='code',
+        ),
+        migrations.RenameField(
+            model_name='gamemodel',
+            old_name='packed_secret_code',
+            new_name='secret_code',
+        ),
+        migrations.RenameField(
+            model_name='guessmodel',
+            old_name='packed_code',
+            new_name='code',
+        ),
+        migrations.AlterField(
+            model_name='gamemodel',
+            name='secret_code',
+            field=mastermind_py.mastermind.models.CodeField(),
+        ),
+        migrations.AlterField(
+            model_name='guessmodel',
+            name='code',
+            field=mastermind_py.mastermind.models.CodeField(),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.2 on 2026-10-18 15:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mastermind', '0005_packed_codes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gamemodel',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 2.2.2 on 2026-10-18 10:57
+
+from django.db import migrations, models
+import mastermind_py.mastermind.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mastermind', '0006_game_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedGameModel',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('reference', models.CharField(max_length=256)),
+                ('num_slots', models.PositiveIntegerField()),
+                ('num_colors', models.PositiveIntegerField()),
+                ('max_guesses', models.PositiveIntegerField()),
+                ('secret_code', mastermind_py.mastermind.models.CodeField()),
+                ('status', models.CharField(max_length=256)),
+                ('registration_datetime', models.DateTimeField()),
+                ('guess_count', models.PositiveIntegerField()),
+                ('last_black_pegs', models.PositiveIntegerField(null=True)),
+                ('last_white_pegs', models.PositiveIntegerField(null=True)),
+                ('version', models.PositiveIntegerField()),
+                ('guesses', models.BinaryField()),
+                ('archived_datetime', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 2.2.2 on 2026-10-18 10:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mastermind', '0007_archived_games'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HourlyGamesModel',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField(unique=True)),
+                ('games', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='GameStatsModel',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('num_slots', models.PositiveIntegerField()),
+                ('num_colors', models.PositiveIntegerField()),
+                ('status', models.CharField(max_length=256)),
+                ('guess_count', models.PositiveIntegerField()),
+                ('games', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('num_slots', 'num_colors', 'status', 'guess_count')},
+            },
+        ),
+    ]
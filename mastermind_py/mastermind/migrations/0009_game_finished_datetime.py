@@ -0,0 +1,32 @@
+# Generated by Django 2.2.2 on 2026-10-18 11:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mastermind', '0008_game_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gamemodel',
+            name='finished_datetime',
+            field=models.DateTimeField(null=True),
+        ),
+        # When the games finished is not known, the time of their last guess is not
+        # stored, so they are taken as finished when they were registered, the age the
+        # archive used before
+        migrations.RunSQL(
+            """
+            UPDATE mastermind_gamemodel SET finished_datetime = registration_datetime
+            WHERE status IN ('won', 'lost')
+            """,
+            migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='gamemodel',
+            index=models.Index(fields=['finished_datetime'], name='game_finished_idx'),
+        ),
+    ]
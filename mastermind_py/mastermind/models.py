@@ -1,20 +1,101 @@
 from typing_extensions import Required
 from django.db import models
-from typing import List
-from django.contrib.postgres.fields import JSONField
+from typing import List, Tuple
+
+from mastermind_py.mastermind.domain import pack_code, palette, unpack_code
+
+
+class CodeField(models.BigIntegerField):
+    """A code, a list of color names, stored packed in a bigint, see pack_code"""
+
+    def from_db_value(self, value, expression, connection):
+        return None if value is None else unpack_code(value)
+
+    def to_python(self, value):
+        if value is None or isinstance(value, list):
+            return value
+        return unpack_code(int(value))
+
+    def get_prep_value(self, value):
+        if isinstance(value, list):
+            value = pack_code(value)
+        return super().get_prep_value(value)
+
 
 class GameModel(models.Model):
     reference = models.CharField(max_length=256)
     num_slots = models.PositiveIntegerField()
     num_colors = models.PositiveIntegerField()
     max_guesses = models.PositiveIntegerField()
-    secret_code = JSONField()
+    secret_code = CodeField()
     status = models.CharField(max_length=256)
-    colors = JSONField()
     registration_datetime = models.DateTimeField(auto_now_add=True)
-    
+    # Denormalized from the guesses of the game, kept up to date by Games.save
+    guess_count = models.PositiveIntegerField(default=0)
+    last_black_pegs = models.PositiveIntegerField(null=True)
+    last_white_pegs = models.PositiveIntegerField(null=True)
+    # Bumped by every change of the game, it is the ETag of its representations
+    version = models.PositiveIntegerField(default=1)
+    # Set by Games.save when the game is won or lost, the age of the games archived
+    finished_datetime = models.DateTimeField(null=True)
+
+    @property
+    def colors(self) -> Tuple[str, ...]:
+        """The colors of a game are always the first num_colors of the palette"""
+        return palette(self.num_colors)
+
+    class Meta:
+        # Serve the keyset pagination of the games list, with and without status filter
+        indexes = [
+            models.Index(fields=['registration_datetime', 'id'], name='game_registration_idx'),
+            models.Index(fields=['status', 'registration_datetime', 'id'], name='game_status_registration_idx'),
+            models.Index(fields=['finished_datetime'], name='game_finished_idx'),
+        ]
+
 class GuessModel(models.Model):
-    code = models.CharField(max_length=256)
+    code = CodeField()
     black_pegs = models.PositiveIntegerField()
     white_pegs = models.PositiveIntegerField()
-    game = models.ForeignKey(GameModel, on_delete=models.CASCADE)
\ No newline at end of file
+    game = models.ForeignKey(GameModel, on_delete=models.CASCADE)
+
+
+class ArchivedGameModel(models.Model):
+    """
+    A finished game moved out of GameModel by the archive_games command, with its
+    guesses packed in a single column, see repo.Archive. The id is the one it had
+    """
+    id = models.IntegerField(primary_key=True)
+    reference = models.CharField(max_length=256)
+    num_slots = models.PositiveIntegerField()
+    num_colors = models.PositiveIntegerField()
+    max_guesses = models.PositiveIntegerField()
+    secret_code = CodeField()
+    status = models.CharField(max_length=256)
+    registration_datetime = models.DateTimeField()
+    guess_count = models.PositiveIntegerField()
+    last_black_pegs = models.PositiveIntegerField(null=True)
+    last_white_pegs = models.PositiveIntegerField(null=True)
+    version = models.PositiveIntegerField()
+    guesses = models.BinaryField()
+    archived_datetime = models.DateTimeField(auto_now_add=True)
+
+
+class GameStatsModel(models.Model):
+    """
+    Rollup of the finished games: how many games of a configuration finished with a
+    status after a number of guesses. Kept up to date by repo.Stats
+    """
+    num_slots = models.PositiveIntegerField()
+    num_colors = models.PositiveIntegerField()
+    status = models.CharField(max_length=256)
+    guess_count = models.PositiveIntegerField()
+    games = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ['num_slots', 'num_colors', 'status', 'guess_count']
+
+
+class HourlyGamesModel(models.Model):
+    """Rollup of the games created in every hour, kept up to date by repo.Stats"""
+    hour = models.DateTimeField(unique=True)
+    games = models.PositiveIntegerField(default=0)
@@ -0,0 +1,25 @@
+from rest_framework.renderers import JSONRenderer
+from rest_framework.compat import SHORT_SEPARATORS
+
+
+class CompactJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that encodes the compact responses, the ones without indent, with a
+    single encoder created once instead of one per json.dumps call. The output is the
+    same, byte for byte, and indented responses are still rendered by JSONRenderer
+    """
+    _encoder = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None or not self.compact or \
+                self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        encoder = type(self)._encoder
+        if encoder is None:
+            encoder = type(self)._encoder = self.encoder_class(
+                ensure_ascii=self.ensure_ascii, allow_nan=not self.strict, separators=SHORT_SEPARATORS)
+
+        # Same escapes as JSONRenderer, see its render method
+        ret = encoder.encode(data).replace('\u2028', '\\u2028').replace('\u2029', '\\u2029')
+        return ret.encode('utf-8')
@@ -1,7 +1,224 @@
+import base64
+import binascii
+import collections
 import json
-from mastermind_py.mastermind.domain import Game, Guess
-from mastermind_py.mastermind.models import GameModel, GuessModel
-from typing import List
+import os
+import struct
+import time
+import numpy as np
+from contextlib import contextmanager
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import connection, transaction
+from django.db.models import Count, F, Model, Value
+from django.db.models.functions import Coalesce, Greatest, TruncHour
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from mastermind_py.mastermind import instrumentation
+from mastermind_py.mastermind.domain import Game, GameStatus, Guess, pack_code, unpack_code
+from mastermind_py.mastermind.models import ArchivedGameModel, GameModel, GameStatsModel, GuessModel, HourlyGamesModel
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Type
+
+
+def encode_cursor(registration_datetime: datetime, id: int) -> str:
+    """Returns the opaque cursor of a position in the games list"""
+    position = '%s|%s' % (registration_datetime.isoformat(), id)
+    return base64.urlsafe_b64encode(position.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Inverse of encode_cursor, raises ValueError if the cursor is not valid"""
+    try:
+        registration_datetime, id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        position = parse_datetime(registration_datetime), int(id)
+    except (TypeError, UnicodeDecodeError, binascii.Error) as error:
+        raise ValueError(error)
+    if position[0] is None:
+        raise ValueError('Invalid cursor')
+    return position
+
+
+class ConflictError(Exception):
+    """Raised when a game is saved after another request changed it since it was read"""
+
+
+class Snapshots:
+    """
+    Read-through cache of the state of every game: the game and its guesses.
+
+    Snapshots are stored under a key that includes a generation of the game, and
+    every write of the game or its guesses moves it to the next generation once it is
+    committed. A reader that loads the state while a write is in progress can only
+    cache it under the previous generation, which is never read again, so a stale
+    snapshot can not outlive the write that made it stale.
+    """
+    # Bump it when the format of the snapshots changes
+    version = 4
+    timeout = 60 * 60
+    generation_timeout = 60 * 60 * 24 * 7
+
+    game_fields = ('id', 'reference', 'num_slots', 'num_colors', 'max_guesses', 'secret_code', 'status',
+                   'registration_datetime', 'guess_count', 'last_black_pegs', 'last_white_pegs', 'version')
+    guess_fields = ('id', 'code', 'black_pegs', 'white_pegs')
+
+    def get(self, id: int, load: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Returns the snapshot of a game, loading it from the database with a single query
+        when it is not cached, or None if the game does not exist. Without load, returns
+        None when it is not cached
+        """
+        generation = cache.get(self._generation_key(id), 0)
+        snapshot = cache.get(self._key(id, generation))
+        instrumentation.record_cache(snapshot is not None)
+        if snapshot is not None or not load:
+            return snapshot
+
+        snapshot = self.load(id)
+        if snapshot is not None:
+            cache.add(self._key(id, generation), snapshot, self.timeout)
+        return snapshot
+
+    def load(self, id: int) -> Optional[Dict[str, Any]]:
+        """
+        Returns the snapshot of a game read from the database, bypassing the cache, or
+        None if the game does not exist. Games that are not in GameModel are read from
+        the archive
+        """
+        rows = GameModel.objects.filter(id = id).values(
+            *self.game_fields, *('guessmodel__%s' % field for field in self.guess_fields)
+        ).order_by('guessmodel__id')
+        if not rows:
+            return Archive().load(id)
+
+        return {
+            'game': {field: rows[0][field] for field in self.game_fields},
+            'guesses': [{field: row['guessmodel__%s' % field] for field in self.guess_fields}
+                        for row in rows if row['guessmodel__id'] is not None],
+        }
+
+    def invalidate(self, id: int) -> None:
+        """
+        Moves a game to its next generation right away, so the transaction that writes
+        it does not read its own stale snapshot, and again once it commits, so the
+        snapshots cached by other readers in the meantime are dropped as well
+        """
+        self._next_generation(id)
+        transaction.on_commit(lambda: self._next_generation(id))
+
+    def _next_generation(self, id: int) -> None:
+        key = self._generation_key(id)
+        if not cache.add(key, 1, self.generation_timeout):
+            try:
+                cache.incr(key)
+            except ValueError:
+                # Evicted between add and incr, the next writer starts it again
+                pass
+
+    @classmethod
+    def _key(cls, id: int, generation: int) -> str:
+        return 'mastermind:game:v%d:%s:%d' % (cls.version, id, generation)
+
+    @staticmethod
+    def _generation_key(id: int) -> str:
+        return 'mastermind:game:generation:%s' % id
+
+
+class HotGames:
+    """
+    Write-behind store of running games, enabled with the HOT_GAMES setting.
+
+    The state of a running game, in the same format as its snapshot, lives in the
+    HOT_GAMES_CACHE while it is played, and guesses are only appended there. The
+    game and its new guesses are written to the database at once when it finishes,
+    or by the flush_hot_games management command when it has been idle for
+    HOT_GAMES_IDLE_TIMEOUT seconds. The rows of the running games are the index of
+    the store: the command finds every hot game among them, so it is also the
+    recovery path after a crash. Guesses that are not flushed yet have no id.
+
+    Unlike the other caches, the hot games are the only copy of the recent guesses,
+    so they are never set with a timeout and HOT_GAMES_CACHE must not ignore errors.
+    """
+    # Seconds a game stays locked if its holder dies without releasing it
+    lock_timeout = 10
+
+    def __init__(self):
+        self.cache = caches[settings.HOT_GAMES_CACHE]
+
+    def get(self, id: int) -> Optional[Dict[str, Any]]:
+        """Returns the state of a hot game, or None if the game is not hot"""
+        return self.cache.get(self._key(id))
+
+    def get_many(self, ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Returns the state of every hot game of ids, by id"""
+        states = self.cache.get_many([self._key(id) for id in ids])
+        return {state['game']['id']: state for state in states.values()}
+
+    def save(self, game: Game, registration_datetime: datetime, stored_version: Optional[int],
+             timeout: Optional[int] = None) -> None:
+        """
+        Stores the state of a game, which must be locked. stored_version is the version
+        of the game in the database, which flush expects to replace. Running games are
+        kept until they are flushed, without timeout
+        """
+        self.cache.set(self._key(game.id), {
+            'game': {'id': game.id, 'reference': game.reference, 'num_slots': game.num_slots,
+                     'num_colors': game.num_colors, 'max_guesses': game.max_guesses,
+                     'secret_code': game.secret_code, 'status': game.status,
+                     'registration_datetime': registration_datetime, 'guess_count': game.guess_count,
+                     'last_black_pegs': game.last_black_pegs, 'last_white_pegs': game.last_white_pegs,
+                     'version': game.version},
+            'guesses': [{'id': guess.id, 'code': guess.code, 'black_pegs': guess.black_pegs,
+                         'white_pegs': guess.white_pegs} for guess in game.guesses],
+            'stored_version': stored_version,
+            'updated': time.time(),
+        }, timeout = timeout)
+
+    def flush(self, game: Game, registration_datetime: datetime, stored_version: Optional[int]) -> None:
+        """
+        Writes the status and the new guesses of a game, which must be locked, to the
+        database, and drops its state once they are committed. Raises ConflictError if
+        the game is no longer at stored_version in the database, when it was already
+        flushed by someone else.
+
+        The lock is released before the request commits, so until then the state is
+        replaced by the flushed game: requests that take the lock in between see it as
+        it will be committed instead of adding the same guesses again. It expires like
+        a snapshot, so it does not outlive a process that dies before dropping it. If
+        the request rolls back, the state is still there for flush_hot_games to write
+        it, which it does before it expires as long as HOT_GAMES_IDLE_TIMEOUT is shorter
+        """
+        with transaction.atomic():
+            Games().save(game, expected_version = stored_version)
+            pending = [guess for guess in game.guesses if guess.id is None]
+            if pending:
+                for guess, guess_model in zip(pending, Guesses().save_all(pending, game)):
+                    guess.id = guess_model.id
+            self.save(game, registration_datetime, stored_version, Snapshots.timeout)
+            transaction.on_commit(lambda: self.cache.delete(self._key(game.id)))
+
+    @contextmanager
+    def lock(self, id: int) -> Iterator[None]:
+        """
+        Serializes the writes of a game, waiting up to lock_timeout for the lock, and
+        raises ConflictError if it is not released by then
+        """
+        key = 'mastermind:hot:lock:%s' % id
+        token = os.urandom(8)
+        deadline = time.monotonic() + self.lock_timeout
+        while not self.cache.add(key, token, self.lock_timeout):
+            if time.monotonic() > deadline:
+                raise ConflictError('The game %s is locked' % id)
+            time.sleep(0.005)
+        try:
+            yield
+        finally:
+            if self.cache.get(key) == token:
+                self.cache.delete(key)
+
+    @staticmethod
+    def _key(id: int) -> str:
+        return 'mastermind:hot:%s' % id
 
 
 class Games:
@@ -11,28 +228,131 @@ class Games:
         """
         return GameModel.objects.all()
 
-    def save(self, game: Game) -> Game:
+    def page(self, status: Optional[str] = None, cursor: Optional[str] = None,
+             limit: int = 100, only: Optional[Iterable[str]] = None) -> Tuple[List[Game], Optional[str]]:
         """
-        Saves the game into a database
+        Returns a page of games, newest first, optionally filtered by status, and the
+        cursor of the next page, or None if it is the last one. only limits the columns
+        read to the ones of the given fields.
+
+        The cursor is the (registration_datetime, id) of the last game of the page, so
+        any page is a range scan of the registration indexes, however deep it is
+        """
+        games = GameModel.objects.order_by('-registration_datetime', '-id')
+        if only is not None:
+            # colors is derived from num_colors, guesses are not columns of the games
+            columns = {'num_colors' if field == 'colors' else field for field in only} - {'guesses'}
+            games = games.only('registration_datetime', *columns)
+        if status is not None:
+            games = games.filter(status = status)
+        if cursor is not None:
+            registration_datetime, id = decode_cursor(cursor)
+            # A row comparison, unlike the equivalent OR of two filters, is a single
+            # index condition
+            games = games.extra(where = ['(registration_datetime, id) < (%s, %s)'],
+                                params = [registration_datetime, id])
+
+        games = list(games[:limit + 1])
+        if len(games) <= limit:
+            return games, None
+        games = games[:limit]
+        return games, encode_cursor(games[-1].registration_datetime, games[-1].id)
+
+    def save(self, game: Game, expected_version: Optional[int] = None) -> Game:
+        """
+        Saves the game into a database with a single query: an insert that returns the
+        new id for new games, or an update of the status and, when the game has new
+        guesses, of the guess counters, the only fields that change once a game is
+        created, and of the version for the existing ones.
+
+        The counters are incremented in the database, so they stay right when guesses
+        are saved concurrently. The version moves to the next one, or to the version of
+        the game when it is ahead, like the games of the hot store, so it never repeats.
+        Save the game before its new guesses, which are the ones without id. A game
+        saved won or lost for the first time gets its finished_datetime.
+
+        With expected_version, the version the game was read at, the update is a
+        compare-and-swap: it raises ConflictError, without changing anything, if the
+        game is not at that version anymore, instead of overwriting the changes of
+        another request.
         """
-        if len(GameModel.objects.filter(id = game.id)):
-            game_model = GameModel.objects.filter(id = game.id)[0]
-            game_model.status = game.status
+        game_model = GameModel(id = game.id, reference = game.reference, num_slots = game.num_slots, num_colors = game.num_colors,
+                               secret_code = game.secret_code, max_guesses = game.max_guesses, status = game.status,
+                               guess_count = game.guess_count, last_black_pegs = game.last_black_pegs, last_white_pegs = game.last_white_pegs,
+                               version = game.version)
+        finished = game.status != GameStatus.RUNNING
+        if game.id is None:
+            game_model.finished_datetime = timezone.now() if finished else None
+            game_model.save(force_insert = True)
         else:
-            game_model = GameModel(reference = game.reference, num_slots = game.num_slots, num_colors = game.num_colors, colors= game.colors, 
-                    secret_code = game.secret_code, max_guesses = game.max_guesses, status = game.status)
+            changes = {'status': game.status, 'version': Greatest(F('version') + 1, Value(game.version))}
+            if finished:
+                changes['finished_datetime'] = Coalesce(F('finished_datetime'), Value(timezone.now()))
+            pending = [guess for guess in game.guesses if guess.id is None]
+            if pending:
+                changes.update(guess_count = F('guess_count') + len(pending),
+                               last_black_pegs = pending[-1].black_pegs, last_white_pegs = pending[-1].white_pegs)
+            games = GameModel.objects.filter(id = game.id)
+            if expected_version is not None:
+                games = games.filter(version = expected_version)
+            if not games.update(**changes) and expected_version is not None:
+                raise ConflictError('The game %s changed since version %d' % (game.id, expected_version))
+            Snapshots().invalidate(game.id)
 
-        game_model.save()
+        return game_model
 
-        return GameModel.objects.filter(id = game_model.id)[0]
+    def save_all(self, games: List[Game], batch_size: int = 1000) -> List[Game]:
+        """
+        Saves several new games into a database, inserting them in batches of
+        batch_size rows per query
+        """
+        return GameModel.objects.bulk_create([
+            GameModel(reference = game.reference, num_slots = game.num_slots, num_colors = game.num_colors,
+                      secret_code = game.secret_code, max_guesses = game.max_guesses, status = game.status)
+            for game in games
+        ], batch_size = batch_size)
+
+    def hydrate(self, games: List[GameModel]) -> List[Game]:
+        """
+        Returns the domain games of several stored games, with their guesses read in a
+        single query. The guesses are used as they are read, without copies
+        """
+        guesses = Guesses().getByGames(games)
+        return [Game.fromSchema(game, guesses[game.id]) for game in games]
 
-    def get(self, id: int) -> Game:
+    def version(self, id: int) -> Optional[int]:
         """
-        Returns a single game by ID
+        Returns the version of a game, or None if the game does not exist. It is read
+        from the cached state of the game when there is one, otherwise only the version
+        is read from the database
         """
+        snapshot = HotGames().get(id) if settings.HOT_GAMES else None
+        if snapshot is None:
+            snapshot = Snapshots().get(id, load = False)
+        if snapshot is not None:
+            return snapshot['game']['version']
+
+        versions = GameModel.objects.filter(id = id).values_list('version', flat = True)
+        if len(versions) > 0:
+            return versions[0]
+        # Archived games are never changed again, their snapshot is cached for good
+        snapshot = Snapshots().get(id)
+        return snapshot['game']['version'] if snapshot is not None else None
 
-        game = GameModel.objects.filter(id = id)
-        return game[0] if len(game) > 0 else {}
+    def get(self, id: int, cached: bool = True) -> Game:
+        """
+        Returns a single game by ID, from its hot state or its snapshot. When not
+        cached, the snapshot is read from the database
+        """
+        snapshot = HotGames().get(id) if settings.HOT_GAMES else None
+        if snapshot is None:
+            snapshot = Snapshots().get(id) if cached else Snapshots().load(id)
+        if snapshot is None:
+            return {}
+
+        game = GameModel(**snapshot['game'])
+        game._snapshot = snapshot
+        return game
         
 class Guesses:
     def all(self) -> List[Guess]:
@@ -43,16 +363,28 @@ class Guesses:
 
     def save(self, guess: Guess, game: GameModel) -> Guess:
         """
-        Saves the guess into a database
+        Saves a new guess into a database with a single insert
         """
-        if len(GuessModel.objects.filter(id = guess.id)):
+        if guess.id is not None:
             raise Exception("You can not update a guess")
-        else:
-            guess = GuessModel(code = guess.code, black_pegs = guess.black_pegs, white_pegs = guess.white_pegs, game = game)
 
-        guess.save()
+        guess_model = GuessModel(code = guess.code, black_pegs = guess.black_pegs, white_pegs = guess.white_pegs, game_id = game.id)
+        guess_model.save(force_insert = True)
+        Snapshots().invalidate(game.id)
+
+        return guess_model
+
+    def save_all(self, guesses: List[Guess], game: GameModel) -> List[Guess]:
+        """
+        Saves several new guesses of a game into a database with a single insert
+        """
+        guess_models = GuessModel.objects.bulk_create([
+            GuessModel(code = guess.code, black_pegs = guess.black_pegs, white_pegs = guess.white_pegs, game_id = game.id)
+            for guess in guesses
+        ])
+        Snapshots().invalidate(game.id)
 
-        return GuessModel.objects.filter(id = guess.id)[0]
+        return guess_models
 
     def get(self, id: int) -> Guess:
         """
@@ -62,10 +394,251 @@ class Guesses:
         guess = GuessModel.objects.filter(id = id)
         return guess[0] if len(guess) > 0 else {}
         
+    def getByGames(self, games: List[GameModel]) -> Dict[int, List[Guess]]:
+        """
+        Returns the guesses of several games, by game ID, read in a single query
+        """
+        guesses = {game.id: [] for game in games}
+        for guess in GuessModel.objects.filter(game_id__in = list(guesses)).order_by('id'):
+            guesses[guess.game_id].append(guess)
+        return guesses
+
     def getByGame(self, game: GameModel) -> List[Guess]:
         """
-        Returns a a list of Guess by game
+        Returns a a list of Guess by game, from the snapshot of the game
+        """
+        snapshot = getattr(game, '_snapshot', None) or Snapshots().get(game.id)
+        if snapshot is None:
+            return []
+        return [GuessModel(game_id = game.id, **guess) for guess in snapshot['guesses']]
+
+
+class Archive:
+    """
+    Finished games moved out of GameModel and GuessModel, so the tables and indexes
+    that running games use only hold the recent ones. Every archived game is a single
+    row, with its guesses packed in one column, and is read as a whole into the same
+    snapshot Snapshots.load returns
+    """
+    # id, packed code, black and white pegs of every guess
+    guess_format = struct.Struct('<iqBB')
+
+    def move(self, finished_before: datetime, limit: int) -> int:
+        """
+        Moves up to limit games that finished before finished_before, with their
+        guesses, to the archive in a single transaction, and returns how many
+        were moved. Games locked by other transactions are skipped, and the chunk only
+        locks the games it moves, so it never waits for nor blocks the running games
+        """
+        with transaction.atomic():
+            ids = list(GameModel.objects.filter(
+                status__in = [GameStatus.WON, GameStatus.LOST], finished_datetime__lt = finished_before
+            ).order_by('id').select_for_update(skip_locked = True).values_list('id', flat = True)[:limit])
+            if not ids:
+                return 0
+
+            games = GameModel.objects.filter(id__in = ids).values(*Snapshots.game_fields)
+            guesses = {id: [] for id in ids}
+            for guess in GuessModel.objects.filter(game_id__in = ids).order_by('id').values(
+                    'game_id', *Snapshots.guess_fields):
+                guesses[guess.pop('game_id')].append(guess)
+
+            ArchivedGameModel.objects.bulk_create([
+                ArchivedGameModel(guesses = self._pack(guesses[game['id']]), **game) for game in games
+            ])
+            GuessModel.objects.filter(game_id__in = ids).delete()
+            GameModel.objects.filter(id__in = ids).delete()
+        # The snapshots of the games are the same once archived, they are kept
+        return len(ids)
+
+    def load(self, id: int) -> Optional[Dict[str, Any]]:
+        """Returns the snapshot of an archived game, see Snapshots.load, or None if it is not archived"""
+        rows = ArchivedGameModel.objects.filter(id = id).values(*Snapshots.game_fields, 'guesses')
+        if not rows:
+            return None
+
+        game = rows[0]
+        return {'game': game, 'guesses': self._unpack(game.pop('guesses'))}
+
+    @classmethod
+    def _pack(cls, guesses: List[Dict[str, Any]]) -> bytes:
+        return b''.join(cls.guess_format.pack(guess['id'], pack_code(guess['code']), guess['black_pegs'],
+                                              guess['white_pegs']) for guess in guesses)
+
+    @classmethod
+    def _unpack(cls, packed: bytes) -> List[Dict[str, Any]]:
+        """Inverse of _pack"""
+        return [{'id': id, 'code': unpack_code(code), 'black_pegs': black_pegs, 'white_pegs': white_pegs}
+                for id, code, black_pegs, white_pegs in cls.guess_format.iter_unpack(packed)]
+
+
+class Candidates:
+    """
+    Codes consistent with the guesses of each running game, kept in the cache so
+    every new guess only filters the codes that were still left
+    """
+    timeout = 60 * 60 * 24
+
+    def get(self, game: Game) -> Optional[np.ndarray]:
+        """
+        Returns the candidates of a game, as returned by Game.candidates, filtering them
+        from the guesses of the game when they are not cached for its last guess
         """
+        candidates = self._unpack(cache.get(self._key(game.id)), game, len(game.guesses))
+        if candidates is not None:
+            return candidates
+
+        candidates = game.candidates()
+        if candidates is not None:
+            cache.set(self._key(game.id), self._pack(candidates, game, len(game.guesses)), self.timeout)
+        return candidates
+
+    def narrow(self, game: Game, guesses: List[Guess]) -> None:
+        """
+        Narrows the cached candidates of a game with its new guesses, the last ones of
+        game.guesses. The cache is written once the guesses are committed
+        """
+        key = self._key(game.id)
+        if game.status != GameStatus.RUNNING:
+            transaction.on_commit(lambda: cache.delete(key))
+            return
+
+        candidates = self._unpack(cache.get(key), game, len(game.guesses) - len(guesses))
+        if candidates is None:
+            candidates = game.candidates()
+        else:
+            for guess in guesses:
+                candidates = game.narrow(candidates, guess)
+
+        if candidates is not None:
+            packed = self._pack(candidates, game, len(game.guesses))
+            transaction.on_commit(lambda: cache.set(key, packed, self.timeout))
+
+    @staticmethod
+    def _key(id: int) -> str:
+        return 'mastermind:candidates:%s' % id
+
+    @staticmethod
+    def _pack(candidates: np.ndarray, game: Game, guesses: int) -> bytes:
+        """
+        Stores the candidates after a number of guesses as a bitset over every code of
+        the configuration or, when there are few enough of them to take less space, as
+        an array of 16 bit indexes
+        """
+        num_codes = game.code_colors ** game.num_slots
+        if len(candidates) * 16 < num_codes:
+            return struct.pack('<cH', b'i', guesses) + candidates.astype('<u2').tobytes()
+        bitset = np.zeros(num_codes, dtype=bool)
+        bitset[candidates] = True
+        return struct.pack('<cH', b'b', guesses) + np.packbits(bitset).tobytes()
+
+    @staticmethod
+    def _unpack(packed: Optional[bytes], game: Game, guesses: int) -> Optional[np.ndarray]:
+        """Inverse of _pack, None unless the candidates were stored after that number of guesses"""
+        if packed is None or struct.unpack_from('<cH', packed) != (packed[:1], guesses):
+            return None
+        data = np.frombuffer(packed[3:], dtype=np.uint8)
+        if packed[:1] == b'i':
+            return data.view('<u2').astype(np.int64)
+        return np.flatnonzero(np.unpackbits(data)[:game.code_colors ** game.num_slots])
+
+
+class Stats:
+    """
+    Aggregate statistics of the games, read from rollups that are updated as games
+    are created and finish, so reading them never scans the games. Every update is a
+    single upsert in the transaction of the change it counts
+    """
+    def created(self, games: Iterable[GameModel]) -> None:
+        """
+        Counts games that were just created, in the hour of their registration_datetime
+        like rebuild does
+        """
+        hours = collections.Counter(game.registration_datetime.replace(minute = 0, second = 0, microsecond = 0)
+                                    for game in games)
+        for hour, count in hours.items():
+            self._increment(HourlyGamesModel, {'hour': hour}, count)
+
+    def finished(self, game: Game) -> None:
+        """Counts a game that was just won or lost"""
+        self._increment(GameStatsModel, {'num_slots': game.num_slots, 'num_colors': game.num_colors,
+                                         'status': game.status, 'guess_count': game.guess_count}, 1)
+
+    def get(self, hours: int) -> Dict[str, Any]:
+        """
+        Returns the win rate, the mean guesses of the won games and their distribution
+        for every configuration, and the games created in each of the last hours
+        """
+        configurations = collections.OrderedDict()  # type: Dict[Tuple[int, int], Dict[str, Any]]
+        for row in GameStatsModel.objects.order_by('num_slots', 'num_colors', 'guess_count').values(
+                'num_slots', 'num_colors', 'status', 'guess_count', 'games'):
+            configuration = configurations.get((row['num_slots'], row['num_colors']))
+            if configuration is None:
+                configuration = configurations[row['num_slots'], row['num_colors']] = {
+                    'num_slots': row['num_slots'], 'num_colors': row['num_colors'],
+                    'games': 0, 'won': 0, 'lost': 0, 'distribution': []}
+            configuration['games'] += row['games']
+            if row['status'] == GameStatus.WON:
+                configuration['won'] += row['games']
+                configuration['distribution'].append({'guesses': row['guess_count'], 'games': row['games']})
+            else:
+                configuration['lost'] += row['games']
+
+        for configuration in configurations.values():
+            configuration['win_rate'] = configuration['won'] / configuration['games']
+            configuration['mean_guesses_to_win'] = sum(
+                row['guesses'] * row['games'] for row in configuration['distribution']
+            ) / configuration['won'] if configuration['won'] else None
+
+        last_hour = timezone.now().replace(minute = 0, second = 0, microsecond = 0)
+        first_hour = last_hour - timedelta(hours = hours - 1)
+        created = dict(HourlyGamesModel.objects.filter(hour__gte = first_hour).values_list('hour', 'games'))
+        return {
+            'configurations': list(configurations.values()),
+            'created_per_hour': [{'hour': hour, 'games': created.get(hour, 0)}
+                                 for hour in (first_hour + timedelta(hours = n) for n in range(hours))],
+        }
+
+    def rebuild(self) -> None:
+        """
+        Recomputes the rollups from every stored game, archived or not. The rollups are
+        locked against the updates of the requests while they are rebuilt, so the games
+        that change meanwhile are counted exactly once
+        """
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute('LOCK TABLE %s, %s IN SHARE ROW EXCLUSIVE MODE' % (
+                    connection.ops.quote_name(GameStatsModel._meta.db_table),
+                    connection.ops.quote_name(HourlyGamesModel._meta.db_table)))
+
+            finished = collections.Counter()  # type: Dict[Tuple[int, int, str, int], int]
+            created = collections.Counter()  # type: Dict[datetime, int]
+            tables = (GameModel, ArchivedGameModel)  # type: Tuple[Type[Model], ...]
+            for model in tables:
+                for row in model.objects.exclude(status = GameStatus.RUNNING).values(
+                        'num_slots', 'num_colors', 'status', 'guess_count').annotate(games = Count('id')).order_by():
+                    finished[row['num_slots'], row['num_colors'], row['status'], row['guess_count']] += row['games']
+                for row in model.objects.annotate(hour = TruncHour('registration_datetime')).values(
+                        'hour').annotate(games = Count('id')).order_by():
+                    created[row['hour']] += row['games']
+
+            GameStatsModel.objects.all().delete()
+            GameStatsModel.objects.bulk_create([
+                GameStatsModel(num_slots = num_slots, num_colors = num_colors, status = status,
+                               guess_count = guess_count, games = games)
+                for (num_slots, num_colors, status, guess_count), games in finished.items()
+            ])
+            HourlyGamesModel.objects.all().delete()
+            HourlyGamesModel.objects.bulk_create([HourlyGamesModel(hour = hour, games = games)
+                                                  for hour, games in created.items()])
 
-        guesses = GuessModel.objects.filter(game = game)
-        return guesses if len(guesses) > 0 else []
\ No newline at end of file
+    @staticmethod
+    def _increment(model: Any, key: Dict[str, Any], count: int) -> None:
+        """Adds count to the games of the row of a rollup with key, creating it if needed"""
+        table = connection.ops.quote_name(model._meta.db_table)
+        columns = ', '.join(key)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'INSERT INTO %s (%s, games) VALUES (%s, %%s) ON CONFLICT (%s) DO UPDATE SET games = %s.games + '
+                'EXCLUDED.games' % (table, columns, ', '.join(['%s'] * len(key)), columns, table),
+                [*key.values(), count])
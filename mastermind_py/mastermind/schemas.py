@@ -1,4 +1,9 @@
-from marshmallow import Schema, fields
+import functools
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from marshmallow import Schema, ValidationError, fields, missing, post_load, utils, validate, validates
+
+from mastermind_py.mastermind.domain import MAX_SLOTS
 
 
 class GuessSchema(Schema):
@@ -8,13 +13,133 @@ class GuessSchema(Schema):
     white_pegs = fields.Int()
 
 
+class GuessBatchSchema(Schema):
+    codes = fields.List(fields.List(fields.Str()), required=True, validate=validate.Length(min=1))
+
+
 class GameSchema(Schema):
     id = fields.Int()
     reference = fields.Str()
     num_colors = fields.Int(required=True)
-    num_slots = fields.Int(required=True)
+    # Codes are stored in 4 bits per color, up to MAX_SLOTS colors
+    num_slots = fields.Int(required=True, validate=validate.Range(min=1, max=MAX_SLOTS))
     max_guesses = fields.Int(missing=10)
     colors = fields.List(fields.Str())
     status = fields.Str()
     secret_code = fields.List(fields.Str())
     guesses = fields.List(fields.Nested(GuessSchema))
+
+
+class GameStateSchema(GameSchema):
+    """GameSchema with the guess counters, which are only dumped when asked for in ?fields="""
+    guess_count = fields.Int()
+    last_black_pegs = fields.Int(allow_none=True)
+    last_white_pegs = fields.Int(allow_none=True)
+
+
+class FieldsetSchema(Schema):
+    """Sparse fieldset of a game response: ?fields=status,last_black_pegs&include=guesses"""
+    only = fields.Str(load_from='fields')
+    include = fields.Str(validate=validate.OneOf(['guesses']))
+
+    @validates('only')
+    def validate_only(self, value):
+        unknown = set(value.split(',')) - set(GameStateSchema._declared_fields)
+        if unknown:
+            raise ValidationError('Unknown fields: %s.' % ', '.join(sorted(unknown)))
+
+    @post_load
+    def split_only(self, data):
+        """Sorts the fields, so every fieldset has a single dump, and moves guesses to include"""
+        if 'only' in data:
+            only = set(data['only'].split(','))
+            if 'guesses' in only:
+                only.discard('guesses')
+                data['include'] = 'guesses'
+            data['only'] = tuple(sorted(only))
+        return data
+
+
+class GameBatchSchema(GameSchema):
+    count = fields.Int(required=True, validate=validate.Range(min=1, max=100000))
+
+
+class GameListSchema(Schema):
+    status = fields.Str(validate=validate.OneOf(['running', 'won', 'lost']))
+    cursor = fields.Str()
+    limit = fields.Int(missing=100, validate=validate.Range(min=1, max=1000))
+
+
+class StatsQuerySchema(Schema):
+    """Hours of games created per hour returned by the stats, up to a week"""
+    hours = fields.Int(missing=24, validate=validate.Range(min=1, max=24 * 7))
+
+
+def _converter(field: fields.Field) -> Callable[[Any], Any]:
+    """
+    Returns a function that formats a value like field._serialize, specialized for the
+    types of field used by the schemas, or field._serialize itself for the others
+    """
+    if isinstance(field, fields.Integer) and not field.as_string:
+        return lambda value: None if value is None else int(value)
+    if isinstance(field, fields.String):
+        return lambda value: value if value is None or type(value) is str else utils.ensure_text_type(value)
+    if isinstance(field, fields.List):
+        container = _converter(field.container)
+        return lambda value: None if value is None else (
+            [container(each) for each in value] if utils.is_collection(value) else [container(value)])
+    if isinstance(field, fields.Nested) and not field.only and not field.exclude:
+        nested = compile_dump(field.schema)
+        if field.many:
+            return lambda value: None if value is None else [nested(each) for each in value]
+        return lambda value: None if value is None else nested(value)
+    return lambda value: field._serialize(value, None, None)
+
+
+def compile_dump(schema: Schema) -> Callable[[Any], Dict[str, Any]]:
+    """
+    Compiles a schema into a function that dumps a single object, a model, a domain
+    object or a values() row, to the same data as schema.dump(obj).data, keys in the
+    same order included, without the per call work of marshmallow: field filtering,
+    error collection and hooks. Only for schemas without dump hooks.
+    """
+    plan = []
+    for name, field in schema.fields.items():
+        if field.load_only:
+            continue
+        plan.append((field.dump_to or name, field.attribute or name, _converter(field), field.default))
+
+    def dump(obj: Any) -> Dict[str, Any]:
+        result = {}
+        is_row = isinstance(obj, dict)
+        for key, attribute, convert, default in plan:
+            value = obj.get(attribute, missing) if is_row else getattr(obj, attribute, missing)
+            if value is missing:
+                value = default() if callable(default) else default
+                if value is not missing:
+                    result[key] = value
+            else:
+                result[key] = convert(value)
+        return result
+
+    return dump
+
+
+def compile_dump_many(schema: Schema) -> Callable[[Any], List[Dict[str, Any]]]:
+    """Like compile_dump, for schema.dump(objs, many=True)"""
+    dump = compile_dump(schema)
+    return lambda objs: [dump(obj) for obj in objs]
+
+
+# Dump functions of the responses of the hot endpoints, compiled once per process
+dump_game = compile_dump(GameSchema())
+dump_games = compile_dump_many(GameSchema())
+dump_guesses = compile_dump_many(GuessSchema())
+
+
+@functools.lru_cache(maxsize=None)
+def game_dump(only: Optional[Tuple[str, ...]] = None) -> Callable[[Any], Dict[str, Any]]:
+    """Returns the dump function of the games, limited to the fields of only when it is given"""
+    if only is None:
+        return dump_game
+    return compile_dump(GameStateSchema(only=only))
@@ -0,0 +1,159 @@
+"""
+Offline evaluation of guessing strategies: plays batches of games of the domain
+model, Game.new and Game.add_guess, across a pool of processes.
+
+Games are played in chunks of a fixed size, every chunk with its own seed drawn
+from the seed of the run, so a run gives the same results whatever the number of
+processes. Workers only receive the parameters of a chunk and only send back the
+histogram of its guess counts. The feedback tables, when they were built with the
+build_feedback_tables command, are memory-mapped by every worker and shared through
+the page cache instead of being copied to each of them.
+"""
+import multiprocessing
+import random
+import time
+import numpy as np
+from typing import List, Optional, Type
+
+from django.utils.module_loading import import_string
+
+from mastermind_py.mastermind import feedback, solver
+from mastermind_py.mastermind.domain import Game, GameStatus, palette
+
+
+class Strategy:
+    """
+    Chooses the guesses of the games of a chunk. uses_candidates tells the engine to
+    keep the code_index of the codes consistent with the guesses of every game, or
+    None when the configuration is too large to enumerate, see Game.candidates
+    """
+    uses_candidates = False
+
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+
+    def guess(self, game: Game, candidates: Optional[np.ndarray]) -> List[str]:
+        raise NotImplementedError
+
+
+class RandomStrategy(Strategy):
+    """Random codes, the baseline every strategy should beat"""
+    def guess(self, game: Game, candidates: Optional[np.ndarray]) -> List[str]:
+        return self.rng.choices(game.colors, k=game.num_slots)
+
+
+class ConsistentStrategy(Strategy):
+    """A random code among the ones that may still be the secret code"""
+    uses_candidates = True
+
+    def guess(self, game: Game, candidates: Optional[np.ndarray]) -> List[str]:
+        if candidates is None:
+            codes, _ = solver.consistent(game.num_slots, game.code_colors, game._history(),
+                                         np.random.RandomState(self.rng.randrange(2 ** 31)))
+        else:
+            codes = feedback.all_codes(game.num_slots, game.code_colors)[candidates]
+        if len(codes) == 0:
+            return self.rng.choices(game.colors, k=game.num_slots)
+        return [game.colors[color] for color in codes[self.rng.randrange(len(codes))]]
+
+
+class MinimaxStrategy(Strategy):
+    """The guesses of the hint endpoint, Knuth's minimax rule, see solver.best_guess"""
+    uses_candidates = True
+
+    def guess(self, game: Game, candidates: Optional[np.ndarray]) -> List[str]:
+        return game.hint(candidates)
+
+
+STRATEGIES = {
+    'random': RandomStrategy,
+    'consistent': ConsistentStrategy,
+    'minimax': MinimaxStrategy,
+}
+
+
+def strategy_class(name: str) -> Type[Strategy]:
+    """Returns a strategy of STRATEGIES by name, or any other one by its dotted path"""
+    if name in STRATEGIES:
+        return STRATEGIES[name]
+    return import_string(name)
+
+
+def play(strategy: str, num_slots: int, num_colors: int, max_guesses: int, seed: int, count: int) -> np.ndarray:
+    """
+    Plays count games and returns the histogram of their outcomes: how many games were
+    won with every number of guesses, and at index 0 how many were lost
+    """
+    # Game.new draws the secret codes from the global random, which is restored so
+    # playing in the calling process does not change it
+    state = random.getstate()
+    random.seed(seed)
+    try:
+        player = strategy_class(strategy)(random.Random(seed + 1))
+        outcomes = np.zeros(max_guesses + 1, dtype=np.int64)
+        for _ in range(count):
+            game = Game.new(num_slots, num_colors, max_guesses)
+            candidates = game.candidates() if player.uses_candidates else None
+            while game.status == GameStatus.RUNNING:
+                guess, status = game.add_guess(player.guess(game, candidates))
+                if candidates is not None and status == GameStatus.RUNNING:
+                    candidates = game.narrow(candidates, guess)
+            outcomes[game.guess_count if game.status == GameStatus.WON else 0] += 1
+        return outcomes
+    finally:
+        random.setstate(state)
+
+
+class Simulation:
+    """Outcomes of the games of a run, see simulate"""
+    def __init__(self, strategy: str, outcomes: np.ndarray, elapsed: float):
+        self.strategy = strategy
+        self.outcomes = outcomes
+        self.elapsed = elapsed
+
+    @property
+    def games(self) -> int:
+        return int(self.outcomes.sum())
+
+    @property
+    def wins(self) -> int:
+        return int(self.outcomes[1:].sum())
+
+    @property
+    def win_rate(self) -> float:
+        return self.wins / self.games
+
+    @property
+    def mean_guesses(self) -> float:
+        """Mean number of guesses of the games that were won"""
+        return float(np.arange(len(self.outcomes)).dot(self.outcomes)) / self.wins if self.wins else 0.0
+
+    @property
+    def games_per_s(self) -> float:
+        return self.games / self.elapsed
+
+
+def simulate(games: int, strategy: str = 'minimax', num_slots: int = 4, num_colors: int = 6,
+             max_guesses: int = 10, seed: int = 0, processes: Optional[int] = None,
+             chunk_size: int = 100) -> Simulation:
+    """
+    Plays games games with a strategy, of STRATEGIES or the dotted path of a Strategy,
+    on processes processes, every core by default. With a single process the games
+    are played in the calling one
+    """
+    strategy_class(strategy)
+    starts = range(0, games, chunk_size)
+    seeds = np.random.RandomState(seed).randint(2 ** 31, size=len(starts))
+    chunks = [(strategy, num_slots, num_colors, max_guesses, int(chunk_seed), min(chunk_size, games - start))
+              for start, chunk_seed in zip(starts, seeds)]
+
+    start = time.perf_counter()
+    if processes == 1:
+        histograms = [play(*chunk) for chunk in chunks]
+    else:
+        # Loaded before forking, so the workers share the mapping of the table
+        feedback.load_table(num_slots, len(palette(num_colors)))
+        with multiprocessing.Pool(processes) as pool:
+            histograms = pool.starmap(play, chunks)
+    outcomes = np.sum(histograms, axis=0) if histograms else np.zeros(max_guesses + 1, dtype=np.int64)
+    return Simulation(strategy, outcomes, time.perf_counter() - start)
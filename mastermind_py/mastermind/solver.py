@@ -0,0 +1,149 @@
+import numpy as np
+from typing import List, Optional, Sequence, Tuple
+
+from mastermind_py.mastermind import feedback
+
+# Configurations with more codes than this are never enumerated, the candidates are
+# sampled from random codes instead
+MAX_CODES = 65536
+# How many random codes are drawn, at most SAMPLE_ROUNDS times, to find candidates
+# when the configuration is too large to enumerate
+SAMPLE_SIZE = 20000
+SAMPLE_ROUNDS = 5
+# Maximum number of (guess, candidate) pairs scored to choose a hint. Knuth's
+# algorithm scores every code against every candidate, when that is over the budget
+# the candidates and the guesses are sampled down to fit in it
+MAX_PAIRS = 2 ** 20
+# Minimum number of guesses evaluated when the candidates have to be sampled
+MIN_GUESSES = 64
+
+History = List[Tuple[Sequence[int], int, int]]
+
+
+def opening(num_slots: int, num_colors: int) -> List[int]:
+    """
+    Returns the first guess of a game, half the slots of one color and half of
+    another one, which is Knuth's 1122 for the classic 4 slots game
+    """
+    split = (num_slots + 1) // 2
+    return [0] * split + [min(1, num_colors - 1)] * (num_slots - split)
+
+
+def feedback_matrix(guesses: np.ndarray, guess_indexes: Optional[np.ndarray],
+                    codes: np.ndarray, code_indexes: Optional[np.ndarray],
+                    num_slots: int, num_colors: int) -> np.ndarray:
+    """
+    Returns the packed feedback of every guess against every code. When the code_index
+    of both are known and the configuration has a feedback table they are read from
+    it, otherwise they are computed with score_matrix
+    """
+    table = feedback.load_table(num_slots, num_colors)
+    if table is not None and guess_indexes is not None and code_indexes is not None:
+        return table[np.ix_(guess_indexes, code_indexes)]
+
+    black_pegs, white_pegs = feedback.score_matrix(guesses, codes, max(num_colors, int(guesses.max()) + 1))
+    return black_pegs * (num_slots + 1) + white_pegs
+
+
+def narrow(codes: np.ndarray, indexes: Optional[np.ndarray], code: Sequence[int],
+           black_pegs: int, white_pegs: int, num_slots: int,
+           num_colors: int) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Keeps the codes that would have given the feedback (black_pegs, white_pegs) to code"""
+    guess = np.array([code], dtype=np.uint8)
+    guess_index = None
+    if indexes is not None and max(code) < num_colors:
+        guess_index = np.array([feedback.code_index(code, num_colors)])
+
+    consistent = feedback_matrix(guess, guess_index, codes, indexes, num_slots, num_colors)[0] == \
+        feedback.pack(black_pegs, white_pegs, num_slots)
+    return codes[consistent], indexes[consistent] if indexes is not None else None
+
+
+def consistent(num_slots: int, num_colors: int, history: History,
+               rng: Optional[np.random.RandomState]) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Returns the codes that would have given every feedback of history, with their
+    code_index. When the configuration is too large to enumerate, the codes are the
+    consistent ones found among a few rounds of random samples drawn with rng, without
+    indexes, rng is only needed then
+    """
+    if num_colors ** num_slots <= MAX_CODES:
+        codes = feedback.all_codes(num_slots, num_colors)
+        indexes = np.arange(len(codes))  # type: Optional[np.ndarray]
+        for code, black_pegs, white_pegs in history:
+            codes, indexes = narrow(codes, indexes, code, black_pegs, white_pegs, num_slots, num_colors)
+        return codes, indexes
+
+    assert rng is not None
+    found = []
+    for _ in range(SAMPLE_ROUNDS):
+        codes = rng.randint(0, num_colors, size=(SAMPLE_SIZE, num_slots)).astype(np.uint8)
+        for code, black_pegs, white_pegs in history:
+            codes, _ = narrow(codes, None, code, black_pegs, white_pegs, num_slots, num_colors)
+        found.append(codes)
+        if sum(len(codes) for codes in found) >= MIN_GUESSES:
+            break
+    return np.unique(np.concatenate(found), axis=0), None
+
+
+def best_guess(num_slots: int, num_colors: int, history: History, seed: int = 0,
+               candidates: Optional[np.ndarray] = None) -> List[int]:
+    """
+    Chooses the next guess with Knuth's minimax rule: the one whose worst feedback
+    leaves the fewest candidates, preferring guesses that may be the secret code.
+
+    The feedbacks of every (guess, candidate) pair are computed as one matrix and
+    the size of every partition is counted with a single bincount. When there are
+    more pairs than MAX_PAIRS, the candidates and the guesses are sampled instead.
+    candidates are the code_index of the consistent codes, when they are already
+    known, so they are not filtered again from the history.
+    """
+    if not history:
+        return opening(num_slots, num_colors)
+
+    rng = np.random.RandomState(seed)
+    indexes = candidates  # type: Optional[np.ndarray]
+    if candidates is not None:
+        codes = feedback.all_codes(num_slots, num_colors)[candidates]
+    else:
+        codes, indexes = consistent(num_slots, num_colors, history, rng)
+    if len(codes) == 0:
+        return rng.randint(0, num_colors, size=num_slots).tolist()
+    if len(codes) <= 2:
+        return codes[0].tolist()
+
+    return minimax(codes, indexes, num_slots, num_colors, rng).tolist()
+
+
+def minimax(codes: np.ndarray, indexes: Optional[np.ndarray], num_slots: int, num_colors: int,
+            rng: np.random.RandomState) -> np.ndarray:
+    """Returns the minimax guess for the candidates codes, see best_guess"""
+    if len(codes) > MAX_PAIRS // MIN_GUESSES:
+        sample = rng.choice(len(codes), MAX_PAIRS // MIN_GUESSES, replace=False)
+        codes, indexes = codes[sample], indexes[sample] if indexes is not None else None
+
+    if indexes is not None and num_colors ** num_slots * len(codes) <= MAX_PAIRS:
+        # Exact search, every code of the configuration is a possible guess
+        pool, pool_indexes = feedback.all_codes(num_slots, num_colors), np.arange(num_colors ** num_slots)
+        is_candidate = np.zeros(len(pool), dtype=bool)
+        is_candidate[indexes] = True
+    else:
+        # Half of the guesses are candidates and the other half random codes
+        size = MAX_PAIRS // len(codes)
+        sample = rng.choice(len(codes), min(len(codes), size // 2), replace=False)
+        others = rng.randint(0, num_colors, size=(size - len(sample), num_slots)).astype(np.uint8)
+        pool = np.concatenate([codes[sample], others])
+        pool_indexes = None
+        if indexes is not None:
+            pool_indexes = np.concatenate([indexes[sample], feedback.code_indexes(others, num_colors)])
+        is_candidate = np.arange(len(pool)) < len(sample)
+
+    matrix = feedback_matrix(pool, pool_indexes, codes, indexes, num_slots, num_colors)
+    outcomes = (num_slots + 1) ** 2
+    offsets = np.arange(len(pool))[:, None] * outcomes
+    partitions = np.bincount((matrix + offsets).ravel(), minlength=len(pool) * outcomes)
+    worst = partitions.reshape(len(pool), outcomes).max(axis=1)
+
+    best = np.flatnonzero(worst == worst.min())
+    preferred = best[is_candidate[best]]
+    return pool[preferred[0] if len(preferred) else best[0]]
@@ -1,10 +1,30 @@
+import datetime
+import io
+import itertools
+import random
+import tempfile
+import threading
+import numpy as np
 from typing import Any, Dict, List
-from django.test import TestCase
+from unittest import mock
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import LiveServerTestCase, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient
 from rest_framework import status
 
-from mastermind_py.mastermind.domain import Game
-from mastermind_py.mastermind.repo import Games
+from mastermind_py.mastermind import feedback, instrumentation, simulation, solver
+from mastermind_py.mastermind import benchmarks
+from mastermind_py.mastermind.benchmarks.feedback import legacy_feedback
+from mastermind_py.mastermind.domain import MAX_SLOTS, Game, GameStatus, Guess, colors, pack_code, unpack_code
+from mastermind_py.mastermind.models import ArchivedGameModel, GameModel, GameStatsModel, GuessModel, HourlyGamesModel
+from mastermind_py.mastermind.renderers import CompactJSONRenderer
+from mastermind_py.mastermind.repo import Candidates, ConflictError, Games, Guesses, HotGames, Stats
+from mastermind_py.mastermind.schemas import GameSchema, GuessSchema, dump_game, dump_games, dump_guesses
 
 class UserTestCase(TestCase):
     def setUp(self):
@@ -29,6 +49,11 @@ class UserTestCase(TestCase):
         game = Games().save(game)
         return game
     
+    def __assertWithinBudget(self, endpoint: str, response: Any):
+        budget = instrumentation.load_budgets()[endpoint]
+        self.assertLessEqual(response.metrics.queries, budget["queries"],
+                             f"{endpoint} ran {response.metrics.queries} queries, its budget is {budget['queries']}")
+
     def __assertGuess(self, response: Any, expected_white_peg: int, expected_black_peg: int):
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(response.json()["guesses"][0]["white_pegs"], expected_white_peg)
@@ -42,6 +67,45 @@ class UserTestCase(TestCase):
         
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.json()["results"][0]), 8)
+        self.__assertWithinBudget("games.list", response)
+
+    def test_get_games_budget(self):
+        """Check listing games with guesses runs a constant number of queries"""
+        for _ in range(5):
+            game = self.__createGame(4, 4, 2, "3DB2C149E8", "running", ["red", "blue", "green", "yellow"], ["red", "red", "green", "yellow"])
+            self.client.post(f'/api/games/{game.id}/guesses/', '{ "code": ["red", "red", "red", "red"] }', content_type='application/json')
+
+        response = self.client.get('/api/games/')
+
+        self.assertEqual(len(response.json()["results"]), 5)
+        self.__assertWithinBudget("games.list", response)
+        self.assertIn('db;dur=', response["Server-Timing"])
+
+    def test_get_games_pages(self):
+        """Check the games are listed newest first, one page after another"""
+        games = [self.__createGame(4, 4, 2, f"REFERENCE{index}", "running", ["red", "blue", "green", "yellow"], ["red", "red", "green", "yellow"]) for index in range(5)]
+
+        first = self.client.get('/api/games/?limit=3').json()
+        second = self.client.get(f'/api/games/?limit=3&cursor={first["next"]}').json()
+
+        self.assertEqual([game["id"] for game in first["results"] + second["results"]], [game.id for game in reversed(games)])
+        self.assertIsNone(second["next"])
+
+    def test_get_games_by_status(self):
+        """Check the games can be filtered by status"""
+        for game_status in ["running", "won", "won", "lost"]:
+            self.__createGame(4, 4, 2, "3DB2C149E8", game_status, ["red", "blue", "green", "yellow"], ["red", "red", "green", "yellow"])
+
+        response = self.client.get('/api/games/?status=won&limit=1')
+        second = self.client.get(f'/api/games/?status=won&limit=1&cursor={response.json()["next"]}')
+
+        self.assertEqual([game["status"] for game in response.json()["results"] + second.json()["results"]], ["won", "won"])
+        self.assertIsNone(second.json()["next"])
+
+    def test_get_games_invalid_query(self):
+        """Check invalid statuses and cursors are rejected"""
+        self.assertEqual(self.client.get('/api/games/?status=paused').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get('/api/games/?cursor=nonsense').status_code, status.HTTP_400_BAD_REQUEST)
 
     def test_get_game(self):
         """Check if retrieve a game correctly"""
@@ -51,6 +115,7 @@ class UserTestCase(TestCase):
         
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.json()), 8)
+        self.__assertWithinBudget("games.retrieve", response)
 
     def test_create_game(self):
         """Check if a game is created correctly"""
@@ -58,7 +123,34 @@ class UserTestCase(TestCase):
         
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(len(response.json()), 8)
+        self.__assertWithinBudget("games.create", response)
     
+    def test_create_game_max_slots(self):
+        """Check a game can have up to MAX_SLOTS slots, the ones a stored code fits"""
+        response = self.client.post('/api/games/', {"num_slots": MAX_SLOTS, "num_colors": 6}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        response = self.client.post('/api/games/', {"num_slots": MAX_SLOTS + 1, "num_colors": 6}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_create_games_batch(self):
+        """Check a batch of games is created with a different reference each"""
+        response = self.client.post('/api/games/batch/', '{ "num_slots": 5, "num_colors": 6, "max_guesses": 8, "count": 50 }', content_type='application/json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.__assertWithinBudget("games.batch", response)
+        results = response.json()["results"]
+        self.assertEqual(len(results), 50)
+        self.assertEqual(len({game["reference"] for game in results}), 50)
+        game = self.client.get(f'/api/games/{results[-1]["id"]}/').json()
+        self.assertEqual((game["num_slots"], game["max_guesses"], len(game["secret_code"])), (5, 8, 5))
+
+    def test_create_games_batch_count(self):
+        """Check a batch of games needs a count"""
+        response = self.client.post('/api/games/batch/', '{ "num_slots": 4, "num_colors": 6 }', content_type='application/json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_create_guess(self):
         """Check if guess create correctly"""
         game = self.__createGame(4, 5, 2, "3DB2C149E8", "running", ["red", "blue", "green", "yellow", "orange"], ["green", "blue", "yellow", "red"])
@@ -77,6 +169,73 @@ class UserTestCase(TestCase):
 
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(len(response.json()["guesses"]), 2)
+        self.__assertWithinBudget("guesses.create", response)
+
+    def test_guess_code_colors(self):
+        """Check guess codes are returned as the submitted list of colors"""
+        game = self.__createGame(4, 5, 2, "3DB2C149E8", "running", ["red", "blue", "green", "yellow", "orange"], ["green", "blue", "yellow", "red"])
+
+        response = self.client.post(f'/api/games/{game.id}/guesses/', '{ "code": ["orange", "red", "blue", "orange"] }', content_type='application/json')
+
+        self.assertEqual(response.json()["guesses"][0]["code"], ["orange", "red", "blue", "orange"])
+
+    def test_invalid_guess_code(self):
+        """Check guesses with colors out of the palette are rejected"""
+        game = self.__createGame(4, 5, 2, "3DB2C149E8", "running", ["red", "blue", "green", "yellow", "orange"], ["green", "blue", "yellow", "red"])
+
+        response = self.client.post(f'/api/games/{game.id}/guesses/', '{ "code": ["orange", "pink", "blue", "orange"] }', content_type='application/json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_retrieve_fieldset(self):
+        """Check retrieve returns only the fields asked for, guess counters included"""
+        game = self.__createGame(4, 5, 2, "3DB2C149E8", "running", ["red", "blue", "green", "yellow", "orange"], ["green", "blue", "yellow", "red"])
+        self.client.post(f'/api/games/{game.id}/guesses/', '{ "code": ["orange", "blue", "yellow", "yellow"] }', content_type='application/json')
+
+        response = self.client.get(f'/api/games/{game.id}/?fields=status,guess_count,last_black_pegs')
+
+        self.assertEqual(response.json(), {"status": "running", "guess_count": 1, "last_black_pegs": 2})
+
+    def test_retrieve_include_guesses(self):
+        """Check retrieve embeds the guesses when asked to, without more queries"""
+        game = self.__createGame(4, 5, 2, "3DB2C149E8", "running", ["red", "blue", "green", "yellow", "orange"], ["green", "blue", "yellow", "red"])
+        self.client.post(f'/api/games/{game.id}/guesses/', '{ "code": ["orange", "blue", "yellow", "yellow"] }', content_type='application/json')
+
+        response = self.client.get(f'/api/games/{game.id}/?include=guesses')
+
+        self.assertEqual(len(response.json()), 9)
+        self.assertEqual([guess["black_pegs"] for guess in response.json()["guesses"]], [2])
+        self.__assertWithinBudget("games.retrieve", response)
+
+    def test_list_fieldset(self):
+        """Check the games list reads and returns only the fields asked for"""
+        game = self.__createGame(4, 5, 2, "3DB2C149E8", "running", ["red", "blue", "green", "yellow", "orange"], ["green", "blue", "yellow", "red"])
+        self.client.post(f'/api/games/{game.id}/guesses/', '{ "code": ["orange", "blue", "yellow", "yellow"] }', content_type='application/json')
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/games/?fields=id,colors')
+        self.assertEqual(response.json()["results"], [{"id": game.id, "colors": ["red", "blue", "green", "yellow", "orange"]}])
+        self.assertNotIn("secret_code", queries.captured_queries[0]["sql"])
+
+        response = self.client.get('/api/games/?fields=status&include=guesses')
+        self.assertEqual([len(result["guesses"]) for result in response.json()["results"]], [1])
+        self.__assertWithinBudget("games.list.guesses", response)
+
+    def test_guess_fieldset(self):
+        """Check guess responses leave the guesses out of a fieldset that does not include them"""
+        game = self.__createGame(4, 5, 2, "3DB2C149E8", "running", ["red", "blue", "green", "yellow", "orange"], ["green", "blue", "yellow", "red"])
+
+        response = self.client.post(f'/api/games/{game.id}/guesses/?fields=status,last_black_pegs,last_white_pegs',
+                                    '{ "code": ["orange", "blue", "yellow", "yellow"] }', content_type='application/json')
+
+        self.assertEqual(response.json(), {"status": "running", "last_black_pegs": 2, "last_white_pegs": 0})
+
+    def test_invalid_fieldset(self):
+        """Check unknown fields and includes are rejected"""
+        game = self.__createGame(4, 5, 2, "3DB2C149E8", "running", ["red", "blue", "green", "yellow", "orange"], ["green", "blue", "yellow", "red"])
+
+        self.assertEqual(self.client.get(f'/api/games/{game.id}/?fields=status,password').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get('/api/games/?include=players').status_code, status.HTTP_400_BAD_REQUEST)
 
     def test_none_white_peg(self):
         """Check if return none white peg"""
@@ -225,6 +384,87 @@ class UserTestCase(TestCase):
 
         self.__assertGuess(response, 1, 0)
 
+    def test_hint(self):
+        """Check a hint is a code of the game palette"""
+        game = self.__createGame(4, 6, 10, "3DB2C149E8", "running", ["red", "blue", "green", "yellow", "orange", "white"], ["green", "blue", "yellow", "red"])
+        self.client.post(f'/api/games/{game.id}/guesses/', '{ "code": ["red", "red", "blue", "blue"] }', content_type='application/json')
+
+        response = self.client.get(f'/api/games/{game.id}/hint/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.__assertWithinBudget("games.hint", response)
+        self.assertEqual(len(response.json()["code"]), 4)
+        self.assertTrue(set(response.json()["code"]) <= set(game.colors))
+
+    def test_hint_more_colors_than_palette(self):
+        """Check games of more colors than the palette are hinted codes of the palette"""
+        game = self.__createGame(4, 9, 10, "3DB2C149E8", "running", colors, ["green", "blue", "yellow", "red"])
+        self.client.post(f'/api/games/{game.id}/guesses/', '{ "code": ["red", "red", "blue", "blue"] }', content_type='application/json')
+
+        response = self.client.get(f'/api/games/{game.id}/hint/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(set(response.json()["code"]) <= set(colors))
+
+    def test_hint_wins_game(self):
+        """Check following the hints wins the game"""
+        game = self.__createGame(4, 6, 10, "3DB2C149E8", "running", ["red", "blue", "green", "yellow", "orange", "white"], ["white", "orange", "orange", "blue"])
+
+        for _ in range(5):
+            code = self.client.get(f'/api/games/{game.id}/hint/').json()["code"]
+            response = self.client.post(f'/api/games/{game.id}/guesses/', {"code": code}, format='json')
+            if response.json()["status"] != "running":
+                break
+
+        self.assertEqual(response.json()["status"], "won")
+
+    def test_hint_finished_game(self):
+        """Check there are no hints for finished games"""
+        game = self.__createGame(4, 6, 10, "3DB2C149E8", "won", ["red", "blue", "green", "yellow", "orange", "white"], ["green", "blue", "yellow", "red"])
+
+        response = self.client.get(f'/api/games/{game.id}/hint/')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_batch_guesses(self):
+        """Check a batch of guesses is scored and stored in order"""
+        game = self.__createGame(4, 5, 10, "3DB2C149E8", "running", ["red", "blue", "green", "yellow", "orange"], ["green", "blue", "yellow", "red"])
+
+        response = self.client.post(f'/api/games/{game.id}/guesses/batch/', {"codes": [["orange", "orange", "orange", "orange"], ["green", "orange", "red", "blue"]]}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.__assertWithinBudget("guesses.batch", response)
+        self.assertEqual(response.json()["status"], "running")
+        pegs = sorted((guess["id"], guess["black_pegs"], guess["white_pegs"]) for guess in response.json()["guesses"])
+        self.assertEqual([(black_pegs, white_pegs) for _, black_pegs, white_pegs in pegs], [(0, 0), (1, 2)])
+
+    def test_batch_guesses_stop_at_win(self):
+        """Check the guesses after the winning one are not applied"""
+        game = self.__createGame(4, 5, 10, "3DB2C149E8", "running", ["red", "blue", "green", "yellow", "orange"], ["green", "blue", "yellow", "red"])
+
+        response = self.client.post(f'/api/games/{game.id}/guesses/batch/', {"codes": [["orange", "orange", "orange", "orange"], ["green", "blue", "yellow", "red"], ["red", "red", "red", "red"]]}, format='json')
+
+        self.assertEqual(response.json()["status"], "won")
+        self.assertEqual(len(response.json()["guesses"]), 2)
+
+    def test_batch_guesses_stop_at_max_guesses(self):
+        """Check the game is lost when the batch reaches max_guesses"""
+        game = self.__createGame(4, 5, 2, "3DB2C149E8", "running", ["red", "blue", "green", "yellow", "orange"], ["green", "blue", "yellow", "red"])
+        self.client.post(f'/api/games/{game.id}/guesses/', '{ "code": ["orange", "orange", "orange", "orange"] }', content_type='application/json')
+
+        response = self.client.post(f'/api/games/{game.id}/guesses/batch/', {"codes": [["orange", "orange", "orange", "orange"], ["green", "blue", "yellow", "red"]]}, format='json')
+
+        self.assertEqual(response.json()["status"], "lost")
+        self.assertEqual(len(response.json()["guesses"]), 2)
+
+    def test_empty_batch(self):
+        """Check a batch needs at least one guess"""
+        game = self.__createGame(4, 5, 2, "3DB2C149E8", "running", ["red", "blue", "green", "yellow", "orange"], ["green", "blue", "yellow", "red"])
+
+        response = self.client.post(f'/api/games/{game.id}/guesses/batch/', {"codes": []}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
 #Feedback Unit Test
 
     def test_One(self):
@@ -291,4 +531,790 @@ class UserTestCase(TestCase):
 
         response = self.client.post(f'/api/games/{game.id}/guesses/', '{ "code": ["orange", "white", "white", "white"] }', content_type='application/json')
 
-        self.__assertGuess(response, 0, 2)
\ No newline at end of file
+        self.__assertGuess(response, 0, 2)
+
+
+class FeedbackTestCase(SimpleTestCase):
+    def test_score_matches_legacy_feedback(self):
+        """Check the histogram kernel agrees with the nested loop implementation"""
+        palette = colors[:4]
+        codes = [list(code) for code in itertools.product(palette, repeat=4)]
+        for secret_code in codes[::5]:
+            game = Game(None, "", 4, 4, secret_code, 10, GameStatus.RUNNING, [])
+            for code in codes:
+                self.assertEqual(game._feedback(code), legacy_feedback(secret_code, code))
+
+    def test_score_integer_codes(self):
+        """Check the kernel scores integer encoded codes with any number of slots"""
+        self.assertEqual(feedback.score([0, 1, 1, 2, 3, 3, 4, 5], [1, 1, 0, 2, 5, 3, 4, 6], 7), (4, 3))
+
+    def test_score_matrix_matches_feedback(self):
+        """Check the batch API scores every pair like Game._feedback"""
+        palette = colors[:6]
+        codes = [list(code) for code in itertools.product(range(6), repeat=4)][::17]
+        black_pegs, white_pegs = feedback.score_matrix(codes, codes, 6)
+
+        self.assertEqual(black_pegs.shape, (len(codes), len(codes)))
+        for j, secret_code in enumerate(codes):
+            game = Game(None, "", 4, 6, [palette[color] for color in secret_code], 10, GameStatus.RUNNING, [])
+            for i, code in enumerate(codes):
+                expected = game._feedback([palette[color] for color in code])
+                self.assertEqual((black_pegs[i, j], white_pegs[i, j]), expected)
+
+    def test_unknown_colors_never_match(self):
+        """Check colors outside the palette score no pegs"""
+        game = Game(None, "", 4, 4, ["red", "red", "blue", "blue"], 10, GameStatus.RUNNING, [])
+
+        self.assertEqual(game._feedback(["pink", "pink", "cyan", "blue"]), (1, 0))
+
+    def test_won_game_with_eight_slots(self):
+        """Check the game is won when every slot matches, whatever the number of slots"""
+        secret_code = ["red", "blue", "green", "yellow", "orange", "white", "purple", "red"]
+        game = Game(None, "", 8, 8, secret_code, 10, GameStatus.RUNNING, [])
+
+        guess, game_status = game.add_guess(list(secret_code))
+
+        self.assertEqual((guess.black_pegs, guess.white_pegs), (8, 0))
+        self.assertEqual(game_status, GameStatus.WON)
+
+
+class BenchmarkCompareTestCase(SimpleTestCase):
+    def test_compare(self):
+        """Check throughputs regress when they drop and the other measures when they grow, but the legacy ones"""
+        baseline = {"repo": {"save_games_per_s": 1000.0, "save_all_100_ms_per_batch": 10.0},
+                    "api": {"list_ms": 2.0, "hint_ms": 5.0}, "feedback": {"legacy_4x6": 1.0}}
+        results = {"repo": {"save_games_per_s": 800.0, "save_all_100_ms_per_batch": 8.0},
+                   "api": {"list_ms": 2.5, "guess_ms": 3.0}, "feedback": {"legacy_4x6": 2.0}}
+
+        changes = {(name, measure): change for name, measure, _, _, change in benchmarks.compare(baseline, results)}
+
+        self.assertEqual(changes, {("repo", "save_games_per_s"): 0.2, ("repo", "save_all_100_ms_per_batch"): -0.2,
+                                   ("api", "list_ms"): 0.25})
+
+
+class FeedbackTableTestCase(SimpleTestCase):
+    def setUp(self):
+        tables_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tables_dir.cleanup)
+        settings_override = override_settings(FEEDBACK_TABLES_DIR=tables_dir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        feedback.load_table.cache_clear()
+        self.addCleanup(feedback.load_table.cache_clear)
+
+    def test_build_table(self):
+        """Check the built table stores the feedback of every pair of codes"""
+        call_command("build_feedback_tables", "3x4", stdout=io.StringIO())
+        table = feedback.load_table(3, 4)
+        codes = feedback.all_codes(3, 4)
+
+        self.assertEqual(table.shape, (64, 64))
+        for secret_code in codes[::7]:
+            for code in codes:
+                value = table[feedback.code_index(secret_code, 4), feedback.code_index(code, 4)]
+                self.assertEqual(feedback.unpack(value, 3), feedback.score(secret_code, code, 4))
+
+    def test_feedback_uses_table(self):
+        """Check Game._feedback reads the pegs from the table when there is one"""
+        call_command("build_feedback_tables", "4x4", stdout=io.StringIO())
+        game = Game(None, "", 4, 4, ["red", "red", "green", "yellow"], 10, GameStatus.RUNNING, [])
+
+        self.assertIsNotNone(feedback.load_table(4, 4))
+        self.assertEqual(game._feedback(["yellow", "red", "red", "blue"]), (1, 2))
+        self.assertEqual(game._feedback(["yellow", "red", "pink", "blue"]), (1, 1))
+
+    def test_missing_table(self):
+        """Check configurations without a table fall back to computing the pegs"""
+        game = Game(None, "", 4, 4, ["red", "red", "green", "yellow"], 10, GameStatus.RUNNING, [])
+
+        self.assertIsNone(feedback.load_table(4, 4))
+        self.assertEqual(game._feedback(["yellow", "red", "red", "blue"]), (1, 2))
+
+
+class SolverTestCase(SimpleTestCase):
+    @staticmethod
+    def __play(num_slots: int, num_colors: int, secret_code: List[int]) -> int:
+        history = []  # type: List[Any]
+        for turn in range(1, 20):
+            code = solver.best_guess(num_slots, num_colors, history, seed=turn)
+            black_pegs, white_pegs = feedback.score(secret_code, code, num_colors)
+            if black_pegs == num_slots:
+                return turn
+            history.append((code, black_pegs, white_pegs))
+        return turn
+
+    def test_knuth_bound(self):
+        """Check the classic 4x6 game is always solved in five guesses"""
+        for secret_code in feedback.all_codes(4, 6)[::37]:
+            self.assertLessEqual(self.__play(4, 6, secret_code.tolist()), 5)
+
+    def test_sampled_configuration(self):
+        """Check configurations too large to enumerate are still solved"""
+        self.assertLessEqual(self.__play(6, 8, [7, 0, 3, 3, 5, 1]), 12)
+
+    def test_candidates_are_consistent(self):
+        """Check every candidate would have given the feedback of the history"""
+        history = [([0, 0, 1, 1], 1, 1), ([2, 3, 1, 0], 0, 2)]
+        codes, indexes = solver.consistent(4, 6, history, np.random.RandomState(0))
+
+        self.assertEqual(indexes.tolist(), feedback.code_indexes(codes, 6).tolist())
+        for code in codes:
+            for guess, black_pegs, white_pegs in history:
+                self.assertEqual(feedback.score(code, guess, 6), (black_pegs, white_pegs))
+
+
+class SimulationTestCase(SimpleTestCase):
+    def test_deterministic(self):
+        """Check a seed gives the same games with any number of processes, without changing the global random"""
+        state = random.getstate()
+
+        alone = simulation.simulate(300, "consistent", seed=3, processes=1, chunk_size=50)
+        pooled = simulation.simulate(300, "consistent", seed=3, processes=2, chunk_size=50)
+        other = simulation.simulate(300, "consistent", seed=4, processes=1, chunk_size=50)
+
+        self.assertEqual(alone.games, 300)
+        self.assertEqual(alone.outcomes.tolist(), pooled.outcomes.tolist())
+        self.assertNotEqual(alone.outcomes.tolist(), other.outcomes.tolist())
+        self.assertEqual(random.getstate(), state)
+
+    def test_more_colors_than_palette(self):
+        """Check games of more colors than the palette are played with codes of the palette"""
+        for strategy in simulation.STRATEGIES:
+            self.assertEqual(simulation.simulate(5, strategy, num_colors=9, processes=1).games, 5)
+
+    def test_minimax(self):
+        """Check the minimax strategy wins every classic game in at most 5 guesses, like Knuth's"""
+        result = simulation.simulate(50, "minimax", processes=1)
+
+        self.assertEqual(result.win_rate, 1)
+        self.assertEqual(result.outcomes[6:].sum(), 0)
+
+    def test_command(self):
+        """Check the command reports the outcomes of every game"""
+        stdout = io.StringIO()
+
+        call_command("simulate", "120", "--strategy", "mastermind_py.mastermind.simulation.RandomStrategy",
+                     "--max-guesses", "3", "--processes", "1", stdout=stdout)
+
+        self.assertIn("Played 120 games", stdout.getvalue())
+        self.assertIn("lost", stdout.getvalue())
+
+
+class CandidatesTestCase(TransactionTestCase):
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+
+    def __guess(self, game: Game, code: List[str]) -> Dict[str, Any]:
+        response = self.client.post(f'/api/games/{game.id}/guesses/', {"code": code}, format='json')
+        return response.json()
+
+    def __game(self, id: int) -> Game:
+        game = Games().get(id)
+        return Game.fromSchema(game, Guesses().getByGame(game))
+
+    def test_narrowed_on_guess(self):
+        """Check each guess narrows the cached candidates to the codes consistent with the history"""
+        game = Games().save(Game(None, "3DB2C149E8", 4, 6, ["green", "blue", "yellow", "red"], 10, GameStatus.RUNNING, []))
+
+        self.__guess(game, ["red", "red", "blue", "blue"])
+        self.__guess(game, ["green", "yellow", "white", "blue"])
+
+        cached = Candidates._unpack(cache.get(f"mastermind:candidates:{game.id}"), game, 2)
+        self.assertEqual(cached.tolist(), self.__game(game.id).candidates().tolist())
+
+    def test_narrowed_on_batch(self):
+        """Check a batch of guesses narrows the cached candidates with every guess"""
+        game = Games().save(Game(None, "3DB2C149E8", 4, 6, ["green", "blue", "yellow", "red"], 10, GameStatus.RUNNING, []))
+        self.__guess(game, ["red", "red", "blue", "blue"])
+
+        self.client.post(f'/api/games/{game.id}/guesses/batch/', {"codes": [["green", "yellow", "white", "blue"], ["orange", "blue", "red", "red"]]}, format='json')
+
+        cached = Candidates._unpack(cache.get(f"mastermind:candidates:{game.id}"), game, 3)
+        self.assertEqual(cached.tolist(), self.__game(game.id).candidates().tolist())
+
+    def test_deleted_on_finish(self):
+        """Check the candidates of a finished game are not kept"""
+        game = Games().save(Game(None, "3DB2C149E8", 4, 6, ["green", "blue", "yellow", "red"], 10, GameStatus.RUNNING, []))
+
+        self.__guess(game, ["red", "red", "blue", "blue"])
+        self.__guess(game, ["green", "blue", "yellow", "red"])
+
+        self.assertIsNone(cache.get(f"mastermind:candidates:{game.id}"))
+
+    def test_packing(self):
+        """Check both storage formats of the candidates hold the same codes"""
+        game = Game(None, "", 4, 6, ["green", "blue", "yellow", "red"], 10, GameStatus.RUNNING, [])
+        for candidates in (np.arange(0, 1296, 3), np.array([5, 700, 1295])):
+            packed = Candidates._pack(candidates, game, 2)
+
+            self.assertEqual(Candidates._unpack(packed, game, 2).tolist(), candidates.tolist())
+            self.assertIsNone(Candidates._unpack(packed, game, 3))
+        self.assertEqual(len(Candidates._pack(np.array([5, 700, 1295]), game, 2)), 9)
+
+
+class SnapshotsTestCase(TransactionTestCase):
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+
+    def test_hit(self):
+        """Check a cached game and its guesses are retrieved without queries"""
+        game = Games().save(Game(None, "3DB2C149E8", 4, 6, ["green", "blue", "yellow", "red"], 10, GameStatus.RUNNING, []))
+        self.client.post(f'/api/games/{game.id}/guesses/', {"code": ["red", "red", "blue", "blue"]}, format='json')
+
+        first = self.client.get(f'/api/games/{game.id}/')
+        second = self.client.get(f'/api/games/{game.id}/')
+
+        self.assertEqual((first.metrics.cache_hits, first.metrics.cache_misses), (0, 1))
+        self.assertEqual((second.metrics.cache_hits, second.metrics.cache_misses), (1, 0))
+        self.assertEqual(second.metrics.queries, 0)
+        self.assertEqual(second.json(), first.json())
+        self.assertIn('cache;desc="1 hits 0 misses"', second['Server-Timing'])
+
+    def test_invalidated_on_guess(self):
+        """Check a guess is seen by the next read of a cached game"""
+        game = Games().save(Game(None, "3DB2C149E8", 4, 6, ["green", "blue", "yellow", "red"], 1, GameStatus.RUNNING, []))
+        self.assertEqual(Guesses().getByGame(Games().get(game.id)), [])
+
+        self.client.post(f'/api/games/{game.id}/guesses/', {"code": ["red", "red", "blue", "blue"]}, format='json')
+
+        game = Games().get(game.id)
+        self.assertEqual(game.status, GameStatus.LOST)
+        self.assertEqual([guess.black_pegs for guess in Guesses().getByGame(game)], [0])
+
+    def test_missing_game(self):
+        """Check missing games are not cached, they are looked up in the games and then in the archive"""
+        self.assertEqual(Games().get(0), {})
+        with self.assertNumQueries(2):
+            self.assertEqual(Games().get(0), {})
+
+
+@override_settings(HOT_GAMES=True)
+class HotGamesTestCase(TransactionTestCase):
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+        self.game = Games().save(Game(None, "3DB2C149E8", 4, 6, ["green", "blue", "yellow", "red"], 3, GameStatus.RUNNING, []))
+
+    def __guess(self, code: List[str]) -> Any:
+        return self.client.post(f'/api/games/{self.game.id}/guesses/', {"code": code}, format='json')
+
+    def test_guesses_kept_in_cache(self):
+        """Check the guesses of a running game are not written to the database"""
+        self.__guess(["red", "red", "blue", "blue"])
+        response = self.__guess(["green", "yellow", "white", "blue"])
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.metrics.queries, 0)
+        self.assertEqual([guess["black_pegs"] for guess in response.json()["guesses"]], [0, 1])
+        self.assertEqual(GuessModel.objects.count(), 0)
+        self.assertEqual(len(Guesses().getByGame(Games().get(self.game.id))), 2)
+
+    def test_flushed_on_finish(self):
+        """Check a finished game and all its guesses are written to the database"""
+        self.__guess(["red", "red", "blue", "blue"])
+        response = self.client.post(f'/api/games/{self.game.id}/guesses/batch/',
+                                    {"codes": [["green", "yellow", "white", "blue"], ["green", "blue", "yellow", "red"]]}, format='json')
+
+        self.assertEqual(response.json()["status"], GameStatus.WON)
+        self.assertTrue(all(guess["id"] for guess in response.json()["guesses"]))
+        self.assertEqual(GameModel.objects.get(id=self.game.id).status, GameStatus.WON)
+        self.assertEqual(GuessModel.objects.filter(game_id=self.game.id).count(), 3)
+        self.assertIsNone(HotGames().get(self.game.id))
+
+    def test_flush_idle(self):
+        """Check flush_hot_games writes the idle games, and every game with --all"""
+        self.__guess(["red", "red", "blue", "blue"])
+
+        call_command("flush_hot_games", stdout=io.StringIO())
+        self.assertEqual(GuessModel.objects.count(), 0)
+
+        call_command("flush_hot_games", "--all", stdout=io.StringIO())
+        self.assertEqual(GuessModel.objects.count(), 1)
+        self.assertIsNone(HotGames().get(self.game.id))
+        self.assertEqual(len(Guesses().getByGame(Games().get(self.game.id))), 1)
+        self.assertEqual(self.__guess(["green", "yellow", "white", "blue"]).json()["status"], GameStatus.RUNNING)
+
+    def test_finished_until_committed(self):
+        """Check a flushed game is seen finished until its transaction commits, and not played again"""
+        self.__guess(["red", "red", "blue", "blue"])
+        state = HotGames().get(self.game.id)
+        game = Game.fromSchema(GameModel(**state["game"]), [GuessModel(**guess) for guess in state["guesses"]])
+        game.add_guess(["green", "blue", "yellow", "red"])
+
+        with transaction.atomic():
+            HotGames().flush(game, state["game"]["registration_datetime"], state["stored_version"])
+            self.assertEqual(HotGames().get(self.game.id)["game"]["status"], GameStatus.WON)
+            self.assertTrue(all(guess["id"] for guess in HotGames().get(self.game.id)["guesses"]))
+            self.assertEqual(self.__guess(["green", "blue", "yellow", "red"]).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIsNone(HotGames().get(self.game.id))
+
+        with self.assertRaises(ConflictError):
+            HotGames().flush(game, state["game"]["registration_datetime"], state["stored_version"])
+        self.assertEqual(GuessModel.objects.filter(game_id=self.game.id).count(), 2)
+
+    def test_flush_rolled_back(self):
+        """Check flush_hot_games writes a finished game whose flush was rolled back, with every guess"""
+        self.__guess(["red", "red", "blue", "blue"])
+        state = HotGames().get(self.game.id)
+        game = Game.fromSchema(GameModel(**state["game"]), [GuessModel(**guess) for guess in state["guesses"]])
+        game.add_guess(["green", "blue", "yellow", "red"])
+
+        with self.assertRaises(ZeroDivisionError):
+            with transaction.atomic():
+                HotGames().flush(game, state["game"]["registration_datetime"], state["stored_version"])
+                1 / 0
+        self.assertEqual(GuessModel.objects.count(), 0)
+
+        call_command("flush_hot_games", "--all", stdout=io.StringIO())
+
+        self.assertEqual(GameModel.objects.get(id=self.game.id).status, GameStatus.WON)
+        self.assertEqual(GuessModel.objects.filter(game_id=self.game.id).count(), 2)
+        self.assertIsNone(HotGames().get(self.game.id))
+
+    def test_errors(self):
+        """Check unknown, finished and locked games are answered with 404, 400 and 409"""
+        response = self.client.post('/api/games/0/guesses/', {"code": ["red", "red", "blue", "blue"]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        with HotGames().lock(self.game.id):
+            with mock.patch.object(HotGames, 'lock_timeout', 0.01):
+                self.assertEqual(self.__guess(["red", "red", "blue", "blue"]).status_code, status.HTTP_409_CONFLICT)
+
+        self.__guess(["green", "blue", "yellow", "red"])
+        self.assertEqual(self.__guess(["green", "blue", "yellow", "red"]).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ArchiveTestCase(TransactionTestCase):
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+        self.games = [Games().save(Game(None, "3DB2C149E8", 4, 6, ["green", "blue", "yellow", "red"], 2,
+                                        GameStatus.RUNNING, [])) for _ in range(4)]
+        self.__play(self.games[0].id, [["red", "red", "blue", "blue"], ["green", "blue", "yellow", "red"]])
+        self.__play(self.games[1].id, [["red", "red", "blue", "blue"], ["white", "white", "white", "white"]])
+        self.__play(self.games[2].id, [["red", "red", "blue", "blue"]])
+        self.assertEqual(GameModel.objects.filter(finished_datetime__isnull=False).count(), 2)
+        GameModel.objects.filter(id__in=[game.id for game in self.games[:3]]).update(
+            registration_datetime=timezone.now() - datetime.timedelta(days=40))
+        GameModel.objects.filter(id__in=[game.id for game in self.games[:2]]).update(
+            finished_datetime=timezone.now() - datetime.timedelta(days=35))
+
+    def __play(self, id: int, codes: List[List[str]]) -> None:
+        self.client.post(f'/api/games/{id}/guesses/batch/', {"codes": codes}, format='json')
+
+    def test_archive(self):
+        """Check only the old finished games are moved, and they are retrieved like before"""
+        before = [self.client.get(f'/api/games/{game.id}/') for game in self.games]
+        cache.clear()
+
+        call_command("archive_games", "--chunk-size", "1", stdout=io.StringIO())
+
+        self.assertEqual(list(ArchivedGameModel.objects.order_by("id").values_list("id", flat=True)),
+                         [game.id for game in self.games[:2]])
+        self.assertEqual(GameModel.objects.count(), 2)
+        self.assertEqual(GuessModel.objects.filter(game_id__in=[game.id for game in self.games[:2]]).count(), 0)
+        for game, response in zip(self.games, before):
+            after = self.client.get(f'/api/games/{game.id}/')
+            self.assertEqual(after.json(), response.json())
+            self.assertEqual(after["ETag"], response["ETag"])
+        not_modified = self.client.get(f'/api/games/{self.games[0].id}/', HTTP_IF_NONE_MATCH=before[0]["ETag"])
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_archive_by_finish(self):
+        """Check old games that finished recently are not archived yet"""
+        GameModel.objects.filter(id=self.games[1].id).update(finished_datetime=timezone.now() - datetime.timedelta(days=1))
+
+        call_command("archive_games", stdout=io.StringIO())
+
+        self.assertEqual(list(ArchivedGameModel.objects.values_list("id", flat=True)), [self.games[0].id])
+
+    def test_archived_game_is_finished(self):
+        """Check an archived game can not be played, and games in neither table do not exist"""
+        call_command("archive_games", stdout=io.StringIO())
+
+        response = self.client.post(f'/api/games/{self.games[0].id}/guesses/', {"code": ["red"] * 4}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Games().get(0), {})
+        self.assertIsNone(Games().version(0))
+
+
+class StatsTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+
+    def __play(self, num_slots: int, num_colors: int, max_guesses: int, codes: List[List[str]] = None) -> None:
+        """Creates a game and plays codes, or wins it with its secret code"""
+        game = self.client.post('/api/games/', {"num_slots": num_slots, "num_colors": num_colors,
+                                                "max_guesses": max_guesses}, format='json').json()
+        if codes is None:
+            codes = [GameModel.objects.get(id=game["id"]).secret_code]
+        for code in codes:
+            self.client.post(f'/api/games/{game["id"]}/guesses/', {"code": code}, format='json')
+
+    def __play_games(self) -> None:
+        self.__play(4, 6, 2, [["white", "white", "white", "white"], ["white", "white", "white", "white"]])
+        self.__play(4, 6, 10)
+        self.__play(4, 6, 10, [["white", "white", "white", "white"]])
+        self.__play(5, 8, 10)
+
+    def test_stats(self):
+        """Check the stats count the finished games by configuration and the created games by hour"""
+        self.__play_games()
+
+        response = self.client.get('/api/games/stats/', {"hours": 3})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertLessEqual(response.metrics.queries, instrumentation.load_budgets()["games.stats"]["queries"])
+        self.assertEqual(response.json()["configurations"], [
+            {"num_slots": 4, "num_colors": 6, "games": 2, "won": 1, "lost": 1, "win_rate": 0.5,
+             "mean_guesses_to_win": 1.0, "distribution": [{"guesses": 1, "games": 1}]},
+            {"num_slots": 5, "num_colors": 8, "games": 1, "won": 1, "lost": 0, "win_rate": 1.0,
+             "mean_guesses_to_win": 1.0, "distribution": [{"guesses": 1, "games": 1}]},
+        ])
+        self.assertEqual([hour["games"] for hour in response.json()["created_per_hour"]], [0, 0, 4])
+
+    def test_invalid_hours(self):
+        """Check the stats only go back a week"""
+        response = self.client.get('/api/games/stats/', {"hours": 24 * 7 + 1})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_created_hours(self):
+        """Check created games are counted in the hour they were registered, like the backfill does"""
+        hour = timezone.now().replace(minute=0, second=0, microsecond=0) - datetime.timedelta(hours=1)
+        games = [GameModel(registration_datetime=hour + datetime.timedelta(minutes=minutes)) for minutes in (0, 59, 60)]
+
+        Stats().created(games)
+
+        self.assertEqual(list(HourlyGamesModel.objects.order_by("hour").values_list("hour", "games")),
+                         [(hour, 2), (hour + datetime.timedelta(hours=1), 1)])
+
+    def test_backfill(self):
+        """Check the backfilled stats, archived games included, are the ones kept by the requests"""
+        self.__play_games()
+        GameModel.objects.update(registration_datetime=timezone.now() - datetime.timedelta(days=40))
+        GameModel.objects.exclude(finished_datetime=None).update(finished_datetime=timezone.now() - datetime.timedelta(days=35))
+        call_command("archive_games", stdout=io.StringIO())
+        expected = Stats().get(24 * 7)
+        GameStatsModel.objects.all().delete()
+        HourlyGamesModel.objects.all().delete()
+
+        call_command("backfill_stats", stdout=io.StringIO())
+
+        self.assertEqual(ArchivedGameModel.objects.count(), 3)
+        self.assertEqual(Stats().get(24 * 7)["configurations"], expected["configurations"])
+        self.assertEqual(HourlyGamesModel.objects.get().games, 4)
+
+
+class SerializationTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    @staticmethod
+    def __game() -> Game:
+        return Game(1, "3DB2C149E8", 4, 6, ["green", "blue", "yellow", "red"], 10, GameStatus.RUNNING,
+                    [Guess(2, ["red", "red", "blue", "blue"], 0, 2), Guess(None, ["green", "blue", "white", "red"], 3, 0)])
+
+    def test_golden_dumps(self):
+        """Check compiled dumps render to the same bytes as the marshmallow dumps"""
+        game = self.__game()
+        game_model = GameModel(id=1, reference="3DB2C149E8", num_slots=4, num_colors=6, max_guesses=10,
+                               secret_code=["green", "blue", "yellow", "red"], status=GameStatus.WON)
+        row = {"id": 1, "reference": None, "num_slots": 4, "num_colors": 6, "secret_code": ["red"], "status": "lost"}
+        for obj in (game, game_model, row, {}):
+            self.assertEqual(JSONRenderer().render(dump_game(obj)), JSONRenderer().render(GameSchema().dump(obj).data))
+        self.assertEqual(JSONRenderer().render(dump_games([game, game_model])),
+                         JSONRenderer().render(GameSchema(many=True).dump([game, game_model]).data))
+        self.assertEqual(JSONRenderer().render(dump_guesses(game.guesses)),
+                         JSONRenderer().render(GuessSchema(many=True).dump(game.guesses).data))
+
+    def test_golden_renderer(self):
+        """Check the compact renderer renders the same bytes as the JSON renderer"""
+        data = {"results": [{"code": ["red", "blue"], "reference": "caf\u00e9 \u2028", "id": None}], "next": 1.5}
+        for media_type in (None, "application/json", "application/json; indent=4"):
+            self.assertEqual(CompactJSONRenderer().render(data, media_type), JSONRenderer().render(data, media_type))
+        self.assertEqual(CompactJSONRenderer().render(None), b"")
+
+    def test_golden_responses(self):
+        """Check the responses of the hot endpoints are the marshmallow dumps of the same games"""
+        game = Games().save(Game(None, "3DB2C149E8", 4, 6, ["green", "blue", "yellow", "red"], 10, GameStatus.RUNNING, []))
+        response = self.client.post(f'/api/games/{game.id}/guesses/', {"code": ["red", "red", "blue", "blue"]}, format='json')
+
+        expected, _ = GameSchema().dump(Games().get(game.id))
+        expected["guesses"], _ = GuessSchema(many=True).dump(GuessModel.objects.filter(game_id=game.id))
+        self.assertEqual(response.content, JSONRenderer().render(expected))
+        expected, _ = GameSchema(many=True).dump(GameModel.objects.order_by("-registration_datetime", "-id"))
+        self.assertEqual(self.client.get('/api/games/').content, JSONRenderer().render({"results": expected, "next": None}))
+
+
+class ETagTestCase(TransactionTestCase):
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+        self.game = Games().save(Game(None, "3DB2C149E8", 4, 6, ["green", "blue", "yellow", "red"], 10, GameStatus.RUNNING, []))
+
+    def __guess(self, code: List[str]) -> Any:
+        return self.client.post(f'/api/games/{self.game.id}/guesses/', {"code": code}, format='json')
+
+    def test_not_modified(self):
+        """Check a game that did not change is not sent again, and is checked from the cache"""
+        etag = self.client.get(f'/api/games/{self.game.id}/')["ETag"]
+
+        response = self.client.get(f'/api/games/{self.game.id}/', HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response.metrics.queries, 0)
+
+    def test_modified_by_guess(self):
+        """Check a guess changes the ETag of the game"""
+        etag = self.client.get(f'/api/games/{self.game.id}/')["ETag"]
+        self.__guess(["red", "red", "blue", "blue"])
+
+        response = self.client.get(f'/api/games/{self.game.id}/', HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(GameModel.objects.get(id=self.game.id).version, 2)
+
+    def test_version_without_cache(self):
+        """Check the version is read alone when the game is not cached"""
+        etag = self.client.get(f'/api/games/{self.game.id}/?fields=status')["ETag"]
+        cache.clear()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/games/{self.game.id}/?fields=status', HTTP_IF_NONE_MATCH=f'W/{etag}')
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(len(queries.captured_queries), 1)
+        self.assertNotIn("JOIN", queries.captured_queries[0]["sql"])
+        self.assertNotEqual(self.client.get(f'/api/games/{self.game.id}/')["ETag"], etag)
+
+    @override_settings(HOT_GAMES=True)
+    def test_hot_versions(self):
+        """Check the versions of a hot game keep increasing once it is written to the database"""
+        self.__guess(["red", "red", "blue", "blue"])
+        self.__guess(["red", "red", "blue", "yellow"])
+        etag = self.client.get(f'/api/games/{self.game.id}/')["ETag"]
+
+        call_command("flush_hot_games", "--all", stdout=io.StringIO())
+
+        self.assertEqual(self.client.get(f'/api/games/{self.game.id}/')["ETag"], etag)
+        self.assertEqual(GameModel.objects.get(id=self.game.id).version, 3)
+        self.__guess(["red", "red", "blue", "green"])
+        self.assertEqual(Games().version(self.game.id), 4)
+
+
+class ConcurrencyTestCase(TransactionTestCase):
+    def test_concurrent_guesses(self):
+        """Check concurrent guesses on the same game never take it past max_guesses"""
+        game = Games().save(Game(None, "3DB2C149E8", 4, 6, ["green", "blue", "yellow", "red"], 5, GameStatus.RUNNING, []))
+        threads = 8
+        barrier = threading.Barrier(threads)
+        responses = []
+
+        def play():
+            client = APIClient()
+            try:
+                barrier.wait()
+                for _ in range(3):
+                    try:
+                        response = client.post(f'/api/games/{game.id}/guesses/', {"code": ["red", "red", "blue", "blue"]}, format='json')
+                        responses.append(response.status_code)
+                    except Exception as error:
+                        responses.append(repr(error))
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=play) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        game_model = GameModel.objects.get(id=game.id)
+        saved = GuessModel.objects.filter(game_id=game.id).count()
+        self.assertLessEqual(set(responses), {201, 400, 409})
+        self.assertEqual(responses.count(201), saved)
+        self.assertEqual((game_model.guess_count, game_model.version), (saved, saved + 1))
+        self.assertLessEqual(saved, 5)
+        self.assertEqual(game_model.status, GameStatus.LOST if saved == 5 else GameStatus.RUNNING)
+        # The losing guess is counted by the stats once, however many requests tried it
+        self.assertEqual(sum(GameStatsModel.objects.values_list("games", flat=True)),
+                         1 if game_model.status == GameStatus.LOST else 0)
+
+    def test_conflict(self):
+        """Check saving a game that changed since it was read fails without changing it"""
+        game = Games().save(Game(None, "3DB2C149E8", 4, 6, ["green", "blue", "yellow", "red"], 5, GameStatus.RUNNING, []))
+        first, second = (Game.fromSchema(Games().get(game.id, cached=False), []) for _ in range(2))
+        first.add_guess(["red", "red", "blue", "blue"])
+        second.add_guess(["red", "red", "blue", "yellow"])
+
+        Games().save(first, expected_version=1)
+        with self.assertRaises(ConflictError):
+            Games().save(second, expected_version=1)
+
+        self.assertEqual((GameModel.objects.get(id=game.id).guess_count, GameModel.objects.get(id=game.id).version), (1, 2))
+
+
+class MetricsTestCase(TestCase):
+    def test_registry(self):
+        """Check the measures are counted by route and the histograms are cumulative"""
+        registry = instrumentation.Registry()
+        metrics = instrumentation.RequestMetrics()
+        metrics.queries, metrics.db_time, metrics.cache_misses, metrics.feedback_time = 3, 0.002, 1, 0.0005
+
+        registry.observe("POST", "api/games/<int:id>/guesses/", 201, 0.02, metrics)
+        registry.observe("POST", "api/games/<int:id>/guesses/", 201, 0.3, metrics)
+        registry.observe("BREW", "unmatched", 404, 0.001, instrumentation.RequestMetrics())
+        lines = registry.render().splitlines()
+
+        labels = 'route="api/games/<int:id>/guesses/",method="POST"'
+        self.assertIn('mastermind_http_requests_total{%s,status="201"} 2' % labels, lines)
+        self.assertIn('mastermind_http_requests_total{route="unmatched",method="other",status="404"} 1', lines)
+        self.assertIn('mastermind_http_request_duration_seconds_bucket{%s,le="0.01"} 0' % labels, lines)
+        self.assertIn('mastermind_http_request_duration_seconds_bucket{%s,le="0.025"} 1' % labels, lines)
+        self.assertIn('mastermind_http_request_duration_seconds_bucket{%s,le="0.5"} 2' % labels, lines)
+        self.assertIn('mastermind_http_request_duration_seconds_bucket{%s,le="+Inf"} 2' % labels, lines)
+        self.assertIn('mastermind_http_request_duration_seconds_count{%s} 2' % labels, lines)
+        self.assertIn('mastermind_http_request_duration_seconds_sum{%s} 0.32' % labels, lines)
+        self.assertIn('mastermind_db_queries_total{%s} 6' % labels, lines)
+        self.assertIn('mastermind_db_duration_seconds_total{%s} 0.004' % labels, lines)
+        self.assertIn('mastermind_cache_misses_total{%s} 2' % labels, lines)
+        self.assertIn('mastermind_feedback_duration_seconds_total{%s} 0.001' % labels, lines)
+
+    def test_savepoints(self):
+        """Check the savepoints of a request are counted, but the one of the test transaction"""
+        client = APIClient()
+        game = client.post('/api/games/', {"num_slots": 4, "num_colors": 6}, format='json').json()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.post(f'/api/games/{game["id"]}/guesses/', {"code": ["red", "red", "red", "red"]}, format='json')
+
+        savepoints = [query["sql"] for query in queries.captured_queries if "SAVEPOINT" in query["sql"]]
+        self.assertEqual(len(savepoints), 4)
+        self.assertEqual(response.metrics.queries, len(queries.captured_queries) - 2)
+
+    def test_endpoint(self):
+        """Check the requests are counted by the pattern of their route and exposed at /metrics"""
+        client = APIClient()
+        game = client.post('/api/games/', {"num_slots": 4, "num_colors": 6}, format='json').json()
+        client.post(f'/api/games/{game["id"]}/guesses/', {"code": ["red", "red", "red", "red"]}, format='json')
+
+        response = client.get('/metrics')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], instrumentation.CONTENT_TYPE)
+        self.assertIn('mastermind_http_requests_total{route="api/games/<int:id>/guesses/",method="POST",status="201"}',
+                      response.content.decode())
+        self.assertIn('# TYPE mastermind_feedback_duration_seconds_total counter', response.content.decode())
+
+
+class LoadTestTestCase(LiveServerTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_load_test(self):
+        """Check the simulated players play every game to the end without errors"""
+        stdout = io.StringIO()
+
+        call_command("load_test", "--url", self.live_server_url + "/api/games/", "--players", "2", "--games", "2",
+                     "--strategy", "solver", stdout=stdout)
+
+        self.assertIn("Played 4 games", stdout.getvalue())
+        self.assertEqual(GameModel.objects.exclude(status=GameStatus.RUNNING).count(), 4)
+        report = {line.split()[0]: line.split()[1:3] for line in stdout.getvalue().splitlines()[2:]}
+        self.assertEqual(report["games.create"], ["4", "0"])
+        self.assertEqual(report["guesses.create"][1], "0")
+        self.assertEqual(report["games.retrieve"][1], "0")
+
+
+class RepositoryTestCase(TestCase):
+    @staticmethod
+    def __game() -> Game:
+        return Game(None, "3DB2C149E8", 4, 4, ["red", "red", "green", "yellow"], 10, GameStatus.RUNNING, [])
+
+    def test_save_new_game(self):
+        """Check a new game is saved with a single insert that returns its id"""
+        with self.assertNumQueries(1):
+            game = Games().save(self.__game())
+
+        self.assertIsNotNone(game.id)
+        self.assertEqual(Games().get(game.id).secret_code, ["red", "red", "green", "yellow"])
+
+    def test_save_game_status(self):
+        """Check saving an existing game is a single update of its status"""
+        game = Game.fromSchema(Games().save(self.__game()), [])
+        game.status = GameStatus.WON
+
+        with self.assertNumQueries(1):
+            Games().save(game)
+
+        self.assertEqual(Games().get(game.id).status, GameStatus.WON)
+
+    def test_save_guess(self):
+        """Check a guess is saved with a single insert"""
+        game = Games().save(self.__game())
+
+        with self.assertNumQueries(1):
+            guess = Guesses().save(Guess(None, ["red", "red", "red", "red"], 2, 0), game)
+
+        self.assertEqual(Guesses().get(guess.id).black_pegs, 2)
+
+    def test_guess_counters(self):
+        """Check saving a game with new guesses updates its counters in the same query"""
+        game = Game.fromSchema(Games().save(self.__game()), [])
+        game.add_guesses([["red", "red", "red", "red"], ["red", "red", "green", "blue"]])
+
+        with self.assertNumQueries(1):
+            Games().save(game)
+
+        game_model = GameModel.objects.get(id=game.id)
+        self.assertEqual((game_model.guess_count, game_model.last_black_pegs, game_model.last_white_pegs), (2, 3, 0))
+
+    def test_lost_without_guesses(self):
+        """Check the status of a game depends on its guess count, not on its loaded guesses"""
+        game_model = Games().save(self.__game())
+        GameModel.objects.filter(id=game_model.id).update(guess_count=9)
+        game = Game.fromSchema(GameModel.objects.get(id=game_model.id), [])
+
+        _, status = game.add_guess(["blue", "blue", "blue", "blue"])
+
+        self.assertEqual(status, GameStatus.LOST)
+
+    def test_packed_codes(self):
+        """Check codes are stored packed in 4 bits per color and read back as colors"""
+        game = Games().save(self.__game())
+        guess = Guesses().save(Guess(None, ["blue", "turquoise", "red"], 0, 1), game)
+
+        self.assertEqual(GuessModel.objects.filter(id=guess.id).values_list("code", flat=True)[0], ["blue", "turquoise", "red"])
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT code FROM mastermind_guessmodel WHERE id = %s", [guess.id])
+            self.assertEqual(cursor.fetchone()[0], 0x182)
+        self.assertEqual(unpack_code(pack_code(["unknown-color"])), ["unknown"])
+
+    def test_hydrate(self):
+        """Check several games are hydrated with their guesses in a single query"""
+        games = [Games().save(self.__game()) for _ in range(3)]
+        Guesses().save_all([Guess(None, ["red", "red", "red", "red"], 2, 0), Guess(None, ["blue", "red", "red", "red"], 1, 0)], games[0])
+        Guesses().save(Guess(None, ["green", "red", "red", "red"], 1, 1), games[2])
+
+        with self.assertNumQueries(1):
+            hydrated = Games().hydrate(games)
+
+        self.assertEqual([[guess.black_pegs for guess in game.guesses] for game in hydrated], [[2, 1], [], [1]])
+        self.assertFalse(hasattr(hydrated[0], "__dict__"))
+        self.assertIs(hydrated[0].colors, hydrated[1].colors)
+
+    def test_update_guess(self):
+        """Check guesses can not be updated"""
+        game = Games().save(self.__game())
+        guess = Guesses().save(Guess(None, ["red", "red", "red", "red"], 2, 0), game)
+
+        with self.assertNumQueries(0), self.assertRaises(Exception):
+            Guesses().save(Guess(guess.id, ["red", "red", "red", "red"], 2, 0), game)
+
@@ -5,6 +5,10 @@ from mastermind_py.mastermind.views import MastermindViewset, GuessesViewset
 app_name = "users"
 urlpatterns = [
     path("", view=MastermindViewset.as_view({'get': 'list', 'post': 'create'}), name="games"),
+    path("batch/", view=MastermindViewset.as_view({'post': 'batch'}), name="games-batch"),
+    path("stats/", view=MastermindViewset.as_view({'get': 'stats'}), name="games-stats"),
     path("<int:id>/", view=MastermindViewset.as_view({'get': 'retrieve'}), name="games"),
-    path("<int:id>/guesses/", view=GuessesViewset.as_view({'post': 'create'}), name='guesses')
+    path("<int:id>/hint/", view=MastermindViewset.as_view({'get': 'hint'}), name="hint"),
+    path("<int:id>/guesses/", view=GuessesViewset.as_view({'post': 'create'}), name='guesses'),
+    path("<int:id>/guesses/batch/", view=GuessesViewset.as_view({'post': 'batch'}), name='guesses-batch')
 ]
@@ -1,18 +1,69 @@
+from django.conf import settings
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.http import parse_etags
 from rest_framework import viewsets, status
-from rest_framework.exceptions import ValidationError
+from rest_framework.exceptions import APIException, NotFound, ValidationError
 from rest_framework.response import Response
 
-from mastermind_py.mastermind.domain import Game, Guess
-from mastermind_py.mastermind.repo import Games, Guesses
-from mastermind_py.mastermind.schemas import GameSchema, GuessSchema
+from mastermind_py.mastermind import instrumentation
+from mastermind_py.mastermind.domain import Game, GameStatus, Guess, is_valid_code
+from mastermind_py.mastermind.repo import Candidates, ConflictError, Games, Guesses, HotGames, Stats
+from mastermind_py.mastermind.schemas import (FieldsetSchema, GameBatchSchema, GameListSchema, GameSchema, GuessBatchSchema,
+                                              GuessSchema, StatsQuerySchema, dump_guesses, game_dump)
+
+
+# Attempts of a guess whose game is changed by concurrent requests
+MAX_ATTEMPTS = 3
+
+
+class GameConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'The game is being changed by other requests, try again.'
+    default_code = 'conflict'
+
+
+def load_fieldset(request):
+    """Returns the sparse fieldset of ?fields= and ?include=, see FieldsetSchema"""
+    fieldset, errors = FieldsetSchema().load(request.query_params)
+    if errors:
+        raise ValidationError(errors)
+    return fieldset
+
+
+def game_etag(version, fieldset):
+    """Strong ETag of a representation of a game: its version and, if any, its fieldset"""
+    if not fieldset:
+        return '"%d"' % version
+    return '"%d;%s;%s"' % (version, ','.join(fieldset.get('only', ())), fieldset.get('include', ''))
+
+
+def metrics(request):
+    """Measures of every request in the Prometheus text format, see instrumentation.Registry"""
+    return HttpResponse(instrumentation.registry.render(), content_type=instrumentation.CONTENT_TYPE)
 
 
 class MastermindViewset(viewsets.ViewSet):
     def list(self, request):
-        games = Games().all()
-        
-        data, _ = GameSchema(many=True).dump(games)
-        return Response(data={'results': data})
+        query, errors = GameListSchema().load(request.query_params)
+        if errors:
+            raise ValidationError(errors)
+
+        fieldset = load_fieldset(request)
+
+        try:
+            games, cursor = Games().page(query.get('status'), query.get('cursor'), query['limit'], fieldset.get('only'))
+        except ValueError:
+            raise ValidationError({'cursor': ['Invalid cursor.']})
+        guesses = Guesses().getByGames(games) if 'include' in fieldset else None
+
+        dump = game_dump(fieldset.get('only'))
+        with instrumentation.serialization():
+            data = [dump(game) for game in games]
+            if guesses is not None:
+                for result, game in zip(data, games):
+                    result['guesses'] = dump_guesses(guesses[game.id])
+        return Response(data={'results': data, 'next': cursor})
 
     def create(self, request):
         data, errors = GameSchema().load(request.data)
@@ -21,14 +72,64 @@ class MastermindViewset(viewsets.ViewSet):
 
         game = Game.new(data['num_slots'], data['num_colors'], data['max_guesses'])
         game = Games().save(game)        
-        result, _ = GameSchema().dump(game)
+        Stats().created([game])
+        with instrumentation.serialization():
+            result = game_dump()(game)
 
         return Response(status=status.HTTP_201_CREATED, data=result)
 
+    def batch(self, request):
+        data, errors = GameBatchSchema().load(request.data)
+        if errors:
+            raise ValidationError(errors)
+
+        games = Game.new_batch(data['count'], data['num_slots'], data['num_colors'], data['max_guesses'])
+        games = Games().save_all(games)
+        Stats().created(games)
+        results = [{'id': game.id, 'reference': game.reference} for game in games]
+
+        return Response(status=status.HTTP_201_CREATED, data={'results': results})
+
     def retrieve(self, request, id):
+        fieldset = load_fieldset(request)
+
+        # Pollers that already have the current version only cost a version check
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match:
+            version = Games().version(id)
+            if version is not None:
+                etag = game_etag(version, fieldset)
+                # If-None-Match compares ETags weakly
+                etags = {tag[2:] if tag.startswith('W/') else tag for tag in parse_etags(if_none_match)}
+                if etag in etags or '*' in etags:
+                    return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
         game = Games().get(id)
-        data, _ = GameSchema().dump(game)
-        return Response(data=data)
+        with instrumentation.serialization():
+            data = game_dump(fieldset.get('only'))(game)
+            if game and 'include' in fieldset:
+                data['guesses'] = dump_guesses(Guesses().getByGame(game))
+        if not game:
+            return Response(data=data)
+        return Response(data=data, headers={'ETag': game_etag(game.version, fieldset)})
+
+    def stats(self, request):
+        query, errors = StatsQuerySchema().load(request.query_params)
+        if errors:
+            raise ValidationError(errors)
+
+        return Response(data=Stats().get(query['hours']))
+
+    def hint(self, request, id):
+        game = Games().get(id)
+        if not game:
+            raise NotFound()
+
+        game = Game.fromSchema(game, Guesses().getByGame(game))
+        if game.status != GameStatus.RUNNING:
+            raise ValidationError('The game is already finished')
+
+        return Response(data={'code': game.hint(Candidates().get(game))})
 
 
 class GuessesViewset(viewsets.ViewSet):
@@ -36,18 +137,92 @@ class GuessesViewset(viewsets.ViewSet):
         data, errors = GuessSchema().load(request.data)
         if errors:
             raise ValidationError(errors)
+        if not is_valid_code(data['code']):
+            raise ValidationError({'code': ['Not a valid code.']})
+        fieldset = load_fieldset(request)
+        if settings.HOT_GAMES:
+            return self._play_hot(fieldset, id, [data['code']])
 
-        game = Games().get(id)
-        guesses = Guesses().getByGame(game)
-        game = Game.fromSchema(game, guesses)
-        guess, gameStatus = game.add_guess(data['code'])
-        game.status = gameStatus
-        game = Games().save(game)
-        Guesses().save(guess, game)
-
-        guesses = Guesses().getByGame(game)
-        guesses = GuessSchema(many=True).dump(guesses)
-        result, _ = GameSchema().dump(game)
-        result["guesses"] = guesses.data
+        return self._play(fieldset, id, [data['code']])
+
+    def batch(self, request, id):
+        data, errors = GuessBatchSchema().load(request.data)
+        if errors:
+            raise ValidationError(errors)
+        if not all(is_valid_code(code) for code in data['codes']):
+            raise ValidationError({'codes': ['Not a valid code.']})
+        fieldset = load_fieldset(request)
+        if settings.HOT_GAMES:
+            return self._play_hot(fieldset, id, data['codes'])
+
+        return self._play(fieldset, id, data['codes'])
+
+    def _play(self, fieldset, id, codes):
+        """
+        Adds guesses to a game without locking it. The game is only saved if no other
+        request changed it since it was read, see Games.save, otherwise it is read again
+        from the database and the guesses are tried again, up to MAX_ATTEMPTS times
+        """
+        for attempt in range(MAX_ATTEMPTS):
+            game_model = Games().get(id, cached=attempt == 0)
+            if not game_model:
+                raise NotFound()
+            guess_models = Guesses().getByGame(game_model)
+            game = Game.fromSchema(game_model, guess_models)
+            if game.status != GameStatus.RUNNING:
+                raise ValidationError('The game is already finished')
+
+            with instrumentation.feedback():
+                guesses, _ = game.add_guesses(codes)
+            try:
+                # The callbacks of a conflicting attempt are dropped with its savepoint
+                with transaction.atomic():
+                    Candidates().narrow(game, guesses)
+                    saved = Games().save(game, expected_version=game_model.version)
+                    guess_models.extend(Guesses().save_all(guesses, saved))
+                    if game.status != GameStatus.RUNNING:
+                        Stats().finished(game)
+            except ConflictError:
+                continue
+            return self._created(fieldset, saved, guess_models)
+
+        raise GameConflict()
+
+    def _play_hot(self, fieldset, id, codes):
+        """Adds guesses to a game kept in the hot store, see HotGames"""
+        hot_games = HotGames()
+        try:
+            with hot_games.lock(id):
+                game_model = Games().get(id)
+                if not game_model:
+                    raise NotFound()
+                game = Game.fromSchema(game_model, Guesses().getByGame(game_model))
+                if game.status != GameStatus.RUNNING:
+                    raise ValidationError('The game is already finished')
+
+                # The version in the database, the one of the game until it is hot
+                stored_version = game_model._snapshot.get('stored_version', game_model.version)
+                with instrumentation.feedback():
+                    guesses, gameStatus = game.add_guesses(codes)
+                Candidates().narrow(game, guesses)
+                if gameStatus == GameStatus.RUNNING:
+                    hot_games.save(game, game_model.registration_datetime, stored_version)
+                else:
+                    hot_games.flush(game, game_model.registration_datetime, stored_version)
+                    Stats().finished(game)
+        except ConflictError:
+            raise GameConflict()
+
+        return self._created(fieldset, game, game.guesses)
+
+    @staticmethod
+    def _created(fieldset, game, guesses):
+        # The snapshot of the game is only invalidated when the request commits, the
+        # response is built from the guesses that were just loaded and saved instead.
+        # They are part of the response unless a fieldset without them is asked for
+        with instrumentation.serialization():
+            result = game_dump(fieldset.get('only'))(game)
+            if 'only' not in fieldset or 'include' in fieldset:
+                result["guesses"] = dump_guesses(guesses)
 
         return Response(status=status.HTTP_201_CREATED, data=result)